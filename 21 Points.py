@@ -1,9 +1,12 @@
 # 21 Points
 
 import random
+from array import array
 
 class Card :
-    """牌"""
+    """牌，只用来显示；牌堆里存的是牌面数字"""
+
+    __slots__ = ("face",)
     
     def __init__(self,face):
         self.face = face
@@ -14,82 +17,154 @@ class Card :
         return f"{faces[self.face]}"
 
 
-class Poker :
-    """扑克"""
+# 每种牌面共用一个 Card，发牌时不用再新建对象
+CARDS = [None] + [Card(face) for face in range(1,14)]
 
-    def __init__(self):
-        self.cards = [Card(face)
-                      for _ in range(4)
-                      for face in range(1,14)]
+
+class Poker :
+    """扑克（牌靴），可以装 1~8 副牌"""
+
+    def __init__(self,rng=None,decks=1,penetration=1.0):
+        if not 1 <= decks <= 8 :
+            raise ValueError(f"decks must be between 1 and 8, got {decks}")
+        if not 0 < penetration <= 1 :
+            raise ValueError(f"penetration must be in (0, 1], got {penetration}")
+        # 新牌时的顺序，每个字节是一张牌的牌面
+        self.deck = array('B', range(1,14)) * (4 * decks)
+        self.cards = array('B', self.deck)
+        # 洗牌用的随机数源，只要有 shuffle(序列) 方法就行，
+        # 如 random.Random 或 points21_shuffle.make_rng() 的结果；
+        # 默认新建一个 random.Random，不受全局 random 状态影响
+        self.rng = rng if rng is not None else random.Random()
+        self.current = 0
+        # 发到这张牌之后就该重新洗牌了
+        self.cut_card = int(len(self.cards) * penetration)
+        # 订阅发牌的对象，需要有 see(card) 和 reset() 方法
+        self.watchers = []
     
         
     def shuffle(self):
+        # 一遍 Fisher–Yates 就是均匀的排列，洗两遍不会更乱
         self.current = 0
-        random.shuffle(self.cards)
-        random.shuffle(self.cards)
+        self.rng.shuffle(self.cards)
+        for watcher in self.watchers:
+            watcher.reset()
 
     def deal(self):
         if self.has_next():
-            card = self.cards[self.current]
+            card = CARDS[self.cards[self.current]]
             self.current += 1
+            for watcher in self.watchers:
+                watcher.see(card)
             return card
         else :
             return None
 
+    def load(self,faces):
+        """直接装入一串牌面（bytes、array 等），代替随机洗牌"""
+        self.current = 0
+        self.cards[:] = array('B', faces)
+        for watcher in self.watchers:
+            watcher.reset()
+
+    def subscribe(self,watcher):
+        """之后每发一张牌都调用 watcher.see(card)，洗牌时调用 watcher.reset()"""
+        self.watchers.append(watcher)
+
     def has_next(self):
         return self.current < len(self.cards)
 
+    def remaining(self):
+        return len(self.cards) - self.current
+
+    def needs_shuffle(self):
+        """是否已经发过切牌位置"""
+        return self.current >= self.cut_card
+
+
+def hand_value(hard,aces):
+    """由 A 记 1 点时的总点数 hard 和 A 的张数 aces 算出点数
+
+    A 先按 10 点算，超过 21 点时每张 A 减 9，
+    也就是最多能有 (21 - hard) // 9 张 A 按 10 点算。
+    """
+    if aces == 0 or hard > 21 :
+        return hard
+    return hard + 9 * min(aces, (21 - hard) // 9)
 
-class Player:
-    """玩家"""
 
-    def __init__(self,name):
+class Hand:
+    """手牌，玩家和庄家共用的计分部分"""
+
+    def __init__(self):
         self.cards = []
+        # 把 A 记为 1 点时的总点数，以及 A 的张数，要牌时随手更新
+        self.hard = 0
+        self.aces = 0
+
+    def hit(self,card):
+        self.cards.append(card)
+        if card.face == 1 :
+            self.aces += 1
+            self.hard += 1
+        elif card.face > 10 :
+            self.hard += 10
+        else :
+            self.hard += card.face
+
+    def clear(self):
+        self.cards.clear()
+        self.hard = 0
+        self.aces = 0
+
+    def calc(self):
+        return hand_value(self.hard,self.aces)
+
+    @property
+    def soft(self):
+        """正按 10 点计算的 A 的张数（0~2），不为 0 即软牌"""
+        return (self.calc() - self.hard) // 9
+
+
+class Player(Hand):
+    """玩家"""
+
+    def __init__(self,name,verbose=True):
+        super().__init__()
         self.name = name
         self.is_bust = False
+        # verbose 为 False 时不打印，供批量模拟使用
+        self.verbose = verbose
         
 
     def hit(self,card):
-        print(f"{self.name.title()} hits {str(card)}.")
-        self.cards.append(card)
+        if self.verbose:
+            print(f"{self.name.title()} hits {str(card)}.")
+        super().hit(card)
 
     def __repr__(self):
         return f"{self.name.title()}: {[str(card) for card in self.cards]} (Points：{self.calc()})"
 
-    def calc(self):
-        value = 0
-        ace_count = 0
-        for card in self.cards :
-            if card.face in (11,12,13):
-                value +=10
-            elif card.face == 1 :
-                ace_count +=1
-                value+=10
-            elif 2 <= card.face <= 10 :
-                value += card.face
-            else :
-                pass
-        while value >21 and ace_count > 0 :
-            value -=9
-            ace_count -=1
-        return value
-
     def stand(self):
-        print(f"{self.name.title()} stands.\n")
+        if self.verbose:
+            print(f"{self.name.title()} stands.\n")
 
 
-class Dealer:
+class Dealer(Hand):
     """庄家"""
 
-    def __init__(self,name):
+    def __init__(self,name,verbose=True):
+        super().__init__()
         self.name = name
-        self.cards = []
         self.hole_up_card = True
         self.is_bust = False
+        self.verbose = verbose
 
     def hit(self,card):
-        self.cards.append(card)
-        if len(self.cards) == 1:
+        super().hit(card)
+        if not self.verbose:
+            pass
+        elif len(self.cards) == 1:
             print(f"{self.name.title()} hits *.")
         else :
             print(f"{self.name.title()} hits {str(card)}.")
@@ -100,31 +175,15 @@ class Dealer:
             return f"{self.name.title()}: [*] {[str(card) for card in self.cards[1:]]}"
         else :
             return f"{self.name.title()}:{[str(card) for card in self.cards[:]]}(Points：{self.calc()})"
-
-    def calc(self):
-        value = 0
-        ace_count = 0
-        for card in self.cards :
-            if card.face in (11,12,13):
-                value +=10
-            elif card.face == 1 :
-                ace_count +=1
-                value+=10
-            elif 2 <= card.face <= 10 :
-                value += card.face
-            else :
-                pass
-        while value >21 and ace_count > 0 :
-            value -=9
-            ace_count -=1
-        return value
     
     def stand(self):
-        print(f"{self.name.title()} stands.")
+        if self.verbose:
+            print(f"{self.name.title()} stands.")
 
     def face_up_card(self):
         self.hole_up_card = False
-        print(f"{self.name.title()} has his card face-up.")
+        if self.verbose:
+            print(f"{self.name.title()} has his card face-up.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+"""以普通模块的方式导入《21 Points.py》
+
+文件名里有空格、又以数字开头，不能直接 import，
+这里按路径加载一次并注册到 sys.modules，其他脚本统一 `from points21 import ...`。
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    "_21points", Path(__file__).with_name("21 Points.py"))
+_game = sys.modules.get(_spec.name)
+if _game is None:
+    _game = importlib.util.module_from_spec(_spec)
+    sys.modules[_spec.name] = _game
+    _spec.loader.exec_module(_game)
+
+from _21points import *
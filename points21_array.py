@@ -0,0 +1,109 @@
+"""21 点的 NumPy 向量化引擎
+
+一次把很多手牌摆成形状为 (hands, 52) 的整数数组，每一行是一副洗好的牌，
+点数、要牌和庄家补牌都用带掩码的数组运算完成，不逐手走 Python 循环。
+计分规则与 Player.calc 一致：A 先按 10 点算，超过 21 点时每张 A 减 9。
+"""
+import numpy as np
+
+from points21_policy import STAND, HIT, DOUBLE, SURRENDER, table_index
+
+
+def hand_totals(hard, aces):
+    """按 Player.calc 的规则计算点数
+
+    hard 是 A 记 1 点时的总和，aces 是 A 的张数。
+    能按 10 点算的 A 的张数为 min(aces, (21 - hard) // 9)，不足 0 时取 0。
+    """
+    tens = np.minimum(aces, np.maximum((21 - hard) // 9, 0))
+    return hard + 9 * tens
+
+
+def play_shoes(shoes, policy, draws, rules=None):
+    """把每一行牌当作一手牌打完，返回 [平局, 玩家赢, 庄家赢, 净输赢, 输赢的平方和]"""
+    payoff = hand_payoffs(shoes, policy, draws, rules)
+    n_win, n_lose = int((payoff > 0).sum()), int((payoff < 0).sum())
+    return [len(payoff) - n_win - n_lose, n_win, n_lose,
+            float(payoff.sum()), float((payoff * payoff).sum())]
+
+
+def hand_payoffs(shoes, policy, draws, rules=None):
+    """把每一行牌当作一手牌打完，返回每手的输赢（以下注为单位的 float64 数组）
+
+    policy 是编译好的 Policy，draws 是 dealer_draws() 编译的庄家规则，
+    每一步决策都是对整列状态查一次表。
+    rules 是 points21_rules.Rules 时按它处理天然黑杰克和保险，规则同 RuleEngine；
+    分牌会让每行的手数不同，这里不支持。
+    """
+    if rules is not None and rules.max_hands > 1:
+        raise ValueError("the array engine cannot split hands; use engine='object'")
+    n = len(shoes)
+    values = np.minimum(shoes, 10).astype(np.int16)
+    aces = (shoes == 1).astype(np.int16)
+    pos = np.full(n, 4)
+    later = policy.later_array
+    dealer_draws = np.array(draws, dtype=bool)
+
+    # 发牌顺序：玩家两张，庄家两张（第一张暗牌，第二张明牌）
+    p_hard = values[:, 0] + values[:, 1]
+    p_aces = aces[:, 0] + aces[:, 1]
+    d_hard = values[:, 2] + values[:, 3]
+    d_aces = aces[:, 2] + aces[:, 3]
+    up = values[:, 3]
+
+    p_total = hand_totals(p_hard, p_aces)
+    first = policy.first_array[table_index(p_total, (p_total - p_hard) // 9, up)]
+    naturals = rules is not None and rules.blackjack_pays is not None
+    if rules is not None:
+        # 一张 A 加一张 10 点牌
+        p_natural = (p_hard == 11) & (p_aces == 1)
+        d_natural = (d_hard == 11) & (d_aces == 1)
+    if naturals:
+        # 玩家是黑杰克、或庄家先看牌发现是黑杰克时，这一手已经有结果，不再要牌
+        first = np.where(p_natural | (d_natural & rules.peek), STAND, first)
+    stake = np.where(first == DOUBLE, 2.0, 1.0)
+
+    # 玩家要牌：每一步只处理还在要牌的行，加倍的行只要一张
+    idx = np.flatnonzero((first == HIT) | (first == DOUBLE))
+    while idx.size:
+        col = pos[idx]
+        p_hard[idx] += values[idx, col]
+        p_aces[idx] += aces[idx, col]
+        pos[idx] = col + 1
+        total = hand_totals(p_hard[idx], p_aces[idx])
+        p_total[idx] = total
+
+        keep = (total <= 21) & (first[idx] == HIT)
+        idx, total = idx[keep], total[keep]
+        idx = idx[later[table_index(total, (total - p_hard[idx]) // 9, up[idx])]]
+
+    # 庄家按规则补牌，玩家已爆牌或投降的行不再补
+    bust = p_total > 21
+    surrender = first == SURRENDER
+    d_total = hand_totals(d_hard, d_aces)
+    settled = bust | surrender
+    if naturals:
+        settled |= p_natural | d_natural
+    idx = np.flatnonzero(~settled)
+    idx = idx[dealer_draws[d_total[idx] * 3 + (d_total[idx] - d_hard[idx]) // 9]]
+    while idx.size:
+        col = pos[idx]
+        d_hard[idx] += values[idx, col]
+        d_aces[idx] += aces[idx, col]
+        pos[idx] = col + 1
+        total = hand_totals(d_hard[idx], d_aces[idx])
+        d_total[idx] = total
+        idx = idx[dealer_draws[total * 3 + (total - d_hard[idx]) // 9]]
+
+    win = ~bust & ((d_total > 21) | (p_total > d_total))
+    lose = bust | (~win & (p_total < d_total))
+    payoff = np.where(win, stake, np.where(lose, -stake, 0.0))
+    payoff[surrender] = -0.5
+    if naturals:
+        lost = d_natural & ~surrender
+        payoff[lost] = -stake[lost]
+        payoff[p_natural] = np.where(d_natural[p_natural], 0.0, rules.blackjack_pays)
+    if rules is not None and rules.insurance:
+        insured = up == 1
+        payoff[insured] += np.where(d_natural[insured] & naturals, 1.0, -0.5)
+    return payoff
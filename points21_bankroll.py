@@ -0,0 +1,210 @@
+"""资金曲线与下注方式的模拟
+
+先批量算出每手以单位下注计的输赢，再按下注方式算出每手想下的注，
+然后逐手推进所有局的资金：实际下注为 min(想下的注, 剩余资金)，
+每一步都是对整批局的 NumPy 运算，循环次数只等于每局的手数。
+资金降到 0 就算破产，之后不再下注；加倍、分牌输掉的钱超过剩余资金时按输光计。
+
+三种下注方式：
+    FlatBet      每手下注固定
+    Martingale   输了下注翻倍、赢了回到底注、平局不变，不超过桌上限额
+    CountBet     按每手开始前的真数下注，输赢来自 points21_count 的连续牌靴
+
+分位数带用 StreamingBands 按批累加直方图，不保存每条曲线，
+模拟多少局都只占 检查点数 × 分箱数 的内存。
+"""
+import numpy as np
+
+from points21_array import hand_payoffs
+from points21_count import counted_outcomes
+from points21_policy import HitBelow, compile_policy, dealer_draws
+from points21_sim import deal_block
+from points21_stats import RunningStats
+
+
+class FlatBet:
+    """每手都下 units 个单位"""
+
+    needs_counts = False
+
+    def __init__(self, units=1):
+        self.units = units
+
+    def bets(self, payoffs, true_counts=None):
+        return np.full(payoffs.shape, float(self.units))
+
+
+class Martingale:
+    """输一手下注翻倍，赢一手回到 base，平局不变，最多下 limit 个单位"""
+
+    needs_counts = False
+
+    def __init__(self, base=1, limit=512):
+        self.base = base
+        self.limit = limit
+
+    def bets(self, payoffs, true_counts=None):
+        # 每手之前连输了几手：累计输的手数减去上一次赢的时候的累计数
+        lose = np.cumsum(payoffs < 0, axis=1)
+        at_win = np.maximum.accumulate(np.where(payoffs > 0, lose, 0), axis=1)
+        streak = np.zeros(payoffs.shape, dtype=np.int64)
+        streak[:, 1:] = (lose - at_win)[:, :-1]
+        return np.minimum(self.base * np.exp2(np.minimum(streak, 62)), self.limit)
+
+
+class CountBet:
+    """按真数下注：真数每多 1 加 1 个单位，限制在 [min_units, max_units]，同 bet_spread()"""
+
+    needs_counts = True
+
+    def __init__(self, min_units=1, max_units=8, system="hi-lo", decks=6, penetration=0.75):
+        self.min_units = min_units
+        self.max_units = max_units
+        self.system = system
+        self.decks = decks
+        self.penetration = penetration
+
+    def bets(self, payoffs, true_counts=None):
+        return np.clip(np.trunc(true_counts), self.min_units, self.max_units)
+
+
+class StreamingBands:
+    """按检查点累加直方图，随时可以读出各分位数
+
+    low、high 是直方图的范围，超出范围的值计入两端的箱子（clipped 记录了个数）；
+    分位数的误差不超过一个箱子的宽度 (high - low) / bins。
+    """
+
+    def __init__(self, n_points, low, high, bins=4096):
+        self.n_points = n_points
+        self.low = low
+        self.width = (high - low) / bins
+        self.bins = bins
+        self.counts = np.zeros((n_points, bins), dtype=np.int64)
+        self.n = 0
+        self.clipped = 0
+
+    def add(self, values):
+        """values 的形状为 (曲线条数, n_points)"""
+        index = np.floor((values - self.low) / self.width).astype(np.int64)
+        outside = (index < 0) | (index >= self.bins)
+        self.clipped += int(outside.sum())
+        np.clip(index, 0, self.bins - 1, out=index)
+        index += np.arange(self.n_points) * self.bins
+        self.counts += np.bincount(index.ravel(), minlength=self.n_points * self.bins).reshape(self.counts.shape)
+        self.n += len(values)
+
+    def percentiles(self, qs=(5, 25, 50, 75, 95)):
+        """返回形状为 (len(qs), n_points) 的数组，箱内按均匀分布插值"""
+        cum = np.cumsum(self.counts, axis=1)
+        rows = np.arange(self.n_points)
+        bands = np.empty((len(qs), self.n_points))
+        for i, q in enumerate(qs):
+            target = q / 100 * self.n
+            index = np.minimum((cum < target).sum(axis=1), self.bins - 1)
+            before = np.where(index > 0, cum[rows, np.maximum(index - 1, 0)], 0)
+            inside = np.maximum(self.counts[rows, index], 1)
+            bands[i] = self.low + (index + np.clip((target - before) / inside, 0, 1)) * self.width
+        return bands
+
+
+def session_outcomes(n_sessions, hands, betting, player_policy, dealer_rule, seed_seq, rules=None):
+    """一批 n_sessions 局、每局 hands 手的 (输赢, 真数)，形状都是 (n_sessions, hands)"""
+    if betting.needs_counts:
+        payoffs = np.empty((n_sessions, hands))
+        true_counts = np.empty((n_sessions, hands))
+        # 每局用自己的牌靴从头开始，种子由这一批的 seed_seq 派生
+        for row, child in enumerate(seed_seq.spawn(n_sessions)):
+            counts, outcomes = counted_outcomes(
+                hands, betting.system, betting.decks, betting.penetration,
+                player_policy, dealer_rule, int(child.generate_state(1)[0]), rules)
+            true_counts[row] = np.frombuffer(counts)
+            payoffs[row] = np.frombuffer(outcomes)
+        return payoffs, true_counts
+    policy = compile_policy(player_policy or HitBelow(17))
+    if rules is not None:
+        policy = rules.compile(policy)
+    shoes = deal_block(n_sessions * hands, seed_seq)
+    payoffs = hand_payoffs(shoes, policy, dealer_draws(dealer_rule), rules)
+    return payoffs.reshape(n_sessions, hands), None
+
+
+def trajectories(payoffs, bets, bankroll):
+    """资金曲线，形状同 payoffs；破产后为 0。返回 (曲线, 是否破产, 下注总额)
+
+    每手实际下注为 min(bets, 剩余资金)，所以资金不够时赢的也只按剩下的钱算。
+    """
+    # 按手转置成连续的行，逐手推进时每次取的是一整行
+    payoffs_t = np.ascontiguousarray(payoffs.T)
+    bets_t = np.ascontiguousarray(bets.T, dtype=float)
+    curve = np.empty(payoffs_t.shape)
+    bank = np.full(payoffs.shape[0], float(bankroll))
+    stake = np.empty_like(bank)
+    wagered = np.zeros_like(bank)
+    for hand in range(payoffs_t.shape[0]):
+        np.minimum(bets_t[hand], bank, out=stake)
+        wagered += stake
+        bank += stake * payoffs_t[hand]
+        np.maximum(bank, 0.0, out=bank)
+        curve[hand] = bank
+    return curve.T, bank <= 0, wagered
+
+
+def simulate_bankroll(n_sessions, hands, betting=None, bankroll=100, player_policy=None,
+                      dealer_rule=17, seed=None, rules=None, checkpoints=50, batch_hands=1 << 18):
+    """模拟 n_sessions 局、每局最多 hands 手的资金变化
+
+    betting 默认每手 1 个单位；rules 同 simulate()，数组引擎不支持分牌。
+    返回 {"sessions", "ruin", "final", "wagered", "points", "bands"}：
+    ruin 为破产的比例，final 为期末资金的 RunningStats，wagered 为平均下注总额，
+    bands 是 points（手数）上 5/25/50/75/95 分位的资金。
+    """
+    betting = betting or FlatBet()
+    points = np.unique(np.linspace(0, hands - 1, min(checkpoints, hands)).astype(np.int64))
+    per_batch = max(1, batch_hands // hands)
+    root = np.random.SeedSequence(seed)
+
+    bands = None
+    final = RunningStats()
+    ruined = 0
+    wagered = 0.0
+    done = 0
+    while done < n_sessions:
+        size = min(per_batch, n_sessions - done)
+        payoffs, true_counts = session_outcomes(size, hands, betting, player_policy,
+                                                dealer_rule, root.spawn(1)[0], rules)
+        curve, broke, bet_total = trajectories(payoffs, betting.bets(payoffs, true_counts), bankroll)
+        if bands is None:
+            # 直方图的范围取第一批的范围再各放宽一倍，资金不会小于 0
+            low, high = float(curve.min()), float(curve.max())
+            margin = max(high - low, 1.0)
+            bands = StreamingBands(len(points), max(low - margin, 0.0), high + margin)
+        bands.add(curve[:, points])
+        final.merge(RunningStats.from_sums(size, float(curve[:, -1].sum()),
+                                           float(np.square(curve[:, -1]).sum())))
+        ruined += int(broke.sum())
+        wagered += float(bet_total.sum())
+        done += size
+
+    return {"sessions": n_sessions, "ruin": ruined / n_sessions, "final": final,
+            "wagered": wagered / n_sessions, "points": points + 1, "bands": bands.percentiles()}
+
+
+if __name__ == "__main__":
+    import time
+
+    from points21_strategy import solve
+
+    table = solve()
+    for name, betting, sessions in (("flat", FlatBet(), 20000),
+                                    ("martingale", Martingale(limit=64), 20000),
+                                    ("hi-lo 1-8", CountBet(), 200)):
+        start = time.perf_counter()
+        result = simulate_bankroll(sessions, 500, betting, bankroll=100, player_policy=table, seed=0)
+        elapsed = time.perf_counter() - start
+        bands = result["bands"]
+        print(f"{name:11} {sessions:>7,} sessions x 500 hands in {elapsed:.2f} s: "
+              f"ruin {result['ruin']:.3f}, mean final {result['final'].mean:.1f}, "
+              f"wagered {result['wagered']:.0f}")
+        print("            final bankroll 5/25/50/75/95%: "
+              + " ".join(f"{band[-1]:.0f}" for band in bands))
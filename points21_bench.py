@@ -0,0 +1,185 @@
+"""21 点引擎热点路径的基准测试
+
+测 Poker.shuffle（random.Random 和 PCG64 两种随机数源）、批量洗牌、Poker.deal、
+Hand.calc 以及整手牌的吞吐量，对象引擎和数组引擎、一副牌和 8 副牌都覆盖到。
+
+    python points21_bench.py                       # 跑一遍并打印结果
+    python points21_bench.py --save bench.json     # 保存为基线
+    python points21_bench.py --compare bench.json  # 与基线比较，变慢超过阈值则退出码为 1
+
+CPython 不提供"分配次数"的计数，tracemalloc 也只记录还活着的内存块，
+所以这里不报告每手牌的分配次数，只报告两个内存指标：
+跑完一轮后还活着、没有释放的内存块数（sys.getallocatedblocks 的增量，用来查泄漏，
+正常应为 0，与分配了多少无关），以及 tracemalloc 统计的峰值内存。
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from points21 import Poker, Player, CARDS
+from points21_sim import simulate
+from points21_count import simulate_counting
+from points21_shuffle import make_rng, shuffle_shoes
+
+
+def bench_shuffle(decks, kind="python"):
+    poker = Poker(make_rng(kind, seed=0), decks)
+    def run(n):
+        for _ in range(n):
+            poker.shuffle()
+    return run
+
+
+def bench_batch_shuffle(decks):
+    rng = make_rng("pcg64", seed=0)
+    def run(n):
+        shuffle_shoes(rng, n, decks)
+    return run
+
+
+def bench_deal(decks):
+    poker = Poker(decks=decks)
+    size = len(poker.cards)
+    def run(n):
+        for _ in range(n // size):
+            poker.current = 0
+            while poker.deal() is not None:
+                pass
+    return run
+
+
+def bench_calc():
+    player = Player("player", verbose=False)
+    for face in (1, 7, 5):
+        player.hit(CARDS[face])
+    def run(n):
+        calc = player.calc
+        for _ in range(n):
+            calc()
+    return run
+
+
+def bench_hands(engine):
+    def run(n):
+        simulate(n, seed=0, engine=engine)
+    return run
+
+
+def bench_shoe_hands(decks):
+    def run(n):
+        simulate_counting(n, decks=decks, bet=lambda tc: 1, seed=0)
+    return run
+
+
+# 名称: (构造函数, 每轮操作数, 单位)
+BENCHMARKS = {
+    "shuffle-1deck": (lambda: bench_shuffle(1), 20000, "shuffles/s"),
+    "shuffle-8deck": (lambda: bench_shuffle(8), 2000, "shuffles/s"),
+    "shuffle-pcg64-1deck": (lambda: bench_shuffle(1, "pcg64"), 100000, "shuffles/s"),
+    "shuffle-pcg64-8deck": (lambda: bench_shuffle(8, "pcg64"), 20000, "shuffles/s"),
+    "shuffle-batch-1deck": (lambda: bench_batch_shuffle(1), 100000, "shoes/s"),
+    "shuffle-batch-8deck": (lambda: bench_batch_shuffle(8), 10000, "shoes/s"),
+    "deal-1deck": (lambda: bench_deal(1), 520000, "cards/s"),
+    "deal-8deck": (lambda: bench_deal(8), 416000, "cards/s"),
+    "calc": (bench_calc, 500000, "calls/s"),
+    "hand-object-1deck": (lambda: bench_hands("object"), 50000, "hands/s"),
+    "hand-array-1deck": (lambda: bench_hands("array"), 500000, "hands/s"),
+    "hand-shoe-1deck": (lambda: bench_shoe_hands(1), 20000, "hands/s"),
+    "hand-shoe-8deck": (lambda: bench_shoe_hands(8), 20000, "hands/s"),
+}
+
+
+def measure(name, repeat=3, scale=1.0):
+    """跑 repeat 轮取最快的一轮，返回 {"rate", "unit", "leaked_blocks_per_op", "peak_kib"}"""
+    make, ops, unit = BENCHMARKS[name]
+    ops = max(1, int(ops * scale))
+    run = make()
+    run(max(1, ops // 10))    # 预热
+
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(ops)
+        best = min(best, time.perf_counter() - start)
+
+    # 内存指标单独测一轮，tracemalloc 本身很慢，不能和计时混在一起
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    run(ops)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+
+    return {"rate": ops / best, "unit": unit,
+            "leaked_blocks_per_op": blocks / ops, "peak_kib": peak / 1024}
+
+
+def run_all(names, repeat=3, scale=1.0):
+    results = {}
+    for name in names:
+        results[name] = measure(name, repeat, scale)
+        result = results[name]
+        print(f"{name:20} {result['rate']:>14,.0f} {result['unit']:11}"
+              f" {result['leaked_blocks_per_op']:>8.3f} leaked blocks/op {result['peak_kib']:>10.1f} KiB peak")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """返回比基线慢了超过 threshold（比例）的基准名称"""
+    regressions = []
+    for name, base in baseline["results"].items():
+        if name not in results:
+            continue
+        change = results[name]["rate"] / base["rate"] - 1
+        flag = "REGRESSION" if change < -threshold else ""
+        print(f"{name:20} {base['rate']:>14,.0f} -> {results[name]['rate']:>14,.0f} {change:+8.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for the 21 Points engine. Reports throughput, blocks still alive "
+                    "after a run (a leak check) and peak traced memory; allocations per hand "
+                    "are not reported, CPython has no allocation counter.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown before --compare fails (default: 0.10)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, best is kept")
+    parser.add_argument("--quick", action="store_true", help="run a tenth of the usual work")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = run_all(args.names or list(BENCHMARKS), args.repeat, 0.1 if args.quick else 1.0)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""按剩余牌的组成计算 21 点各动作的期望
+
+《21 Points.py》每局都从同一副 Poker 里不放回地发牌，
+最优决策取决于还剩哪些牌。这里的期望按不放回抽牌精确计算，
+以剩余牌的张数向量为键放进有上限的 LRU 缓存，同一局里反复查询几乎不用重算。
+
+庄家的终点分布不再一张张递归：从某个起点开始，庄家能补出的每一组牌
+（按点数计的多重集合）和它们合规的补牌顺序数只取决于规则，先列出来存好；
+换一种剩余牌时，每组牌的概率就是几个下降阶乘之比，用 NumPy 一次算完。
+
+实时决策每发一张牌剩余牌就变了，缓存很难命中，action_evs() 的精确递归太慢。
+quick_action_evs() 只按当前剩余牌把庄家的分布精确算一次（每种明牌一次，停牌、要牌、加倍共用），
+玩家之后要的牌按当前剩余牌的比例抽，也不从庄家的牌里去掉，
+换一种剩余牌也只要几百微秒。CompositionAdvisor 默认用它。
+
+缓存键用的是点数 1~10 的 10 维张数：J、Q、K 和 10 对点数的作用完全一样，
+合并以后不同的剩余牌更容易命中同一条缓存。
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from points21 import hand_value
+from points21_policy import dealer_draws
+from points21_strategy import BUST, shoe_counts
+
+# 每个缓存最多保留的条目数
+CACHE_SIZE = 1 << 18
+
+
+def fold_ranks(counts):
+    """把 13 种牌面（A~K）的张数合并成点数 1~10 的张数；已经是 10 维的原样返回"""
+    counts = tuple(counts)
+    if len(counts) == 13:
+        return counts[:9] + (sum(counts[9:]),)
+    return counts
+
+
+def _without(counts, value):
+    """少了一张 value 点的牌之后的张数"""
+    return counts[:value - 1] + (counts[value - 1] - 1,) + counts[value:]
+
+
+def _draws(counts):
+    """剩余牌里每种点数被抽到的 (点数, 概率)"""
+    size = sum(counts)
+    return [(value, count / size) for value, count in enumerate(counts, 1) if count]
+
+
+@lru_cache(maxsize=None)
+def _dealer_hands(hard, aces, dealer_rule=17):
+    """庄家从 (hard, aces) 开始能补出的所有牌
+
+    返回 (takes, ways, finals, most)：takes[i, v - 1] 是第 i 组牌里 v 点牌的张数，
+    ways[i] 是这组牌按规则（停牌或爆牌之前一直要补）能依次补出来的顺序数，
+    finals[i] 是补完后的终点（22 为爆牌），most 是最多补几张。
+    """
+    draws = dealer_draws(dealer_rule)
+    takes, ways, finals = [], [], []
+    # 同样张数的牌一层层往下算，{牌的组合: (顺序数, hard, aces)}
+    level = {(0,) * 10: (1, hard, aces)}
+    while level:
+        following = {}
+        for taken, (count, hard, aces) in level.items():
+            total = hand_value(hard, aces)
+            if total > 21 or not draws[total * 3 + (total - hard) // 9]:
+                takes.append(taken)
+                ways.append(count)
+                finals.append(min(total, BUST))
+                continue
+            for value in range(1, 11):
+                key = taken[:value - 1] + (taken[value - 1] + 1,) + taken[value:]
+                before = following.get(key, (0,))[0]
+                following[key] = (before + count, hard + value, min(aces + (value == 1), 2))
+        level = following
+    takes = np.array(takes)
+    return takes, np.array(ways, dtype=float), np.array(finals), int(takes.sum(axis=1).max())
+
+
+def _dealer_finals_by_card(counts, hard, aces, dealer_rule):
+    """逐张递归的写法，剩下的牌不够庄家补完时用（牌抽完了庄家就停在当前点数）"""
+    total = hand_value(hard, aces)
+    dist = [0.0] * (BUST + 1)
+    if total > 21:
+        dist[BUST] = 1.0
+    elif not dealer_draws(dealer_rule)[total * 3 + (total - hard) // 9] or not any(counts):
+        dist[total] = 1.0
+    else:
+        for value, p in _draws(counts):
+            sub = _dealer_finals_by_card(_without(counts, value), hard + value,
+                                         min(aces + (value == 1), 2), dealer_rule)
+            for final, q in enumerate(sub):
+                if q:
+                    dist[final] += p * q
+    return dist
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def dealer_finals(counts, hard, aces, dealer_rule=17):
+    """庄家从 (hard, aces) 开始、从 counts 里不放回地补牌，返回终点分布（下标 22 为爆牌）"""
+    takes, ways, finals, most = _dealer_hands(hard, min(aces, 2), dealer_rule)
+    size = sum(counts)
+    if size < most:
+        return tuple(_dealer_finals_by_card(counts, hard, aces, dealer_rule))
+    # 一组牌按某个顺序抽出的概率是各点数张数的下降阶乘之积除以总张数的下降阶乘，与顺序无关
+    depth = np.arange(most)
+    falling = np.ones((10, most + 1))
+    falling[:, 1:] = np.cumprod(np.array(counts, dtype=float)[:, None] - depth, axis=1)
+    total_falling = np.ones(most + 1)
+    total_falling[1:] = np.cumprod(float(size) - depth)
+    p = ways * falling[np.arange(10), takes].prod(axis=1) / total_falling[takes.sum(axis=1)]
+    return tuple(np.bincount(finals, weights=p, minlength=BUST + 1).tolist())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def stand_evs(counts, up, dealer_rule=17):
+    """庄家明牌为 up 时停在 0~21 点各自的期望（下标即点数），counts 为没见过的牌"""
+    dist = dealer_finals(counts, up, int(up == 1), dealer_rule)
+    evs = []
+    below, above = 0.0, sum(dist[:BUST])
+    for total in range(22):
+        above -= dist[total]
+        evs.append(dist[BUST] + below - above)
+        below += dist[total]
+    return tuple(evs)
+
+
+def stand_ev(counts, total, up, dealer_rule=17):
+    """停牌的期望；counts 是玩家没见过的牌（含庄家暗牌）"""
+    if total > 21:
+        return -1.0
+    return stand_evs(counts, up, dealer_rule)[total]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def hit_ev(counts, hard, aces, up, dealer_rule=17):
+    """要一张牌、之后按最优方式继续的期望"""
+    ev = 0.0
+    for value, p in _draws(counts):
+        rest = _without(counts, value)
+        next_hard, next_aces = hard + value, min(aces + (value == 1), 2)
+        total = hand_value(next_hard, next_aces)
+        if total > 21:
+            ev -= p
+        else:
+            ev += p * max(stand_ev(rest, total, up, dealer_rule),
+                          hit_ev(rest, next_hard, next_aces, up, dealer_rule))
+    return ev
+
+
+def double_ev(counts, hard, aces, up, dealer_rule=17):
+    """加倍：下注翻倍，只再要一张牌"""
+    return 2 * sum(p * stand_ev(_without(counts, value),
+                                hand_value(hard + value, aces + (value == 1)), up, dealer_rule)
+                   for value, p in _draws(counts))
+
+
+def split_ev(counts, value, up, dealer_rule=17):
+    """分牌的期望
+
+    两手各补一张牌后按最优方式打；第二手没有扣掉第一手抽走的牌，
+    是常用的近似，误差只在第二手的几张牌上。
+    """
+    ev = 0.0
+    for card, p in _draws(counts):
+        rest = _without(counts, card)
+        hard, aces = value + card, (value == 1) + (card == 1)
+        ev += p * max(stand_ev(rest, hand_value(hard, aces), up, dealer_rule),
+                      hit_ev(rest, hard, aces, up, dealer_rule),
+                      double_ev(rest, hard, aces, up, dealer_rule))
+    return 2 * ev
+
+
+def action_evs(counts, hard, aces, up, dealer_rule=17, first_two=True, pair=None):
+    """counts 为没见过的牌时，(hard, aces) 这手牌各动作的期望"""
+    counts = fold_ranks(counts)
+    aces = min(aces, 2)
+    evs = {
+        "stand": stand_ev(counts, hand_value(hard, aces), up, dealer_rule),
+        "hit": hit_ev(counts, hard, aces, up, dealer_rule),
+    }
+    if first_two:
+        evs["double"] = double_ev(counts, hard, aces, up, dealer_rule)
+    if pair:
+        evs["split"] = split_ev(counts, pair, up, dealer_rule)
+    return evs
+
+
+@lru_cache(maxsize=None)
+def _successors(hard, aces):
+    """(hard, aces) 再要一张 value 点的牌后的 [(value - 1, hard, aces, 点数)]，按 value 排列"""
+    result = []
+    for value in range(1, 11):
+        next_hard, next_aces = hard + value, min(aces + (value == 1), 2)
+        result.append((value - 1, next_hard, next_aces, hand_value(next_hard, next_aces)))
+    return tuple(result)
+
+
+def quick_action_evs(counts, hard, aces, up, dealer_rule=17, first_two=True, pair=None):
+    """实时决策用的近似期望，参数和结果同 action_evs()
+
+    庄家的终点分布按 counts 精确算（stand_evs() 的缓存，同一种剩余牌只算一次），
+    停牌、要牌、加倍都用这一份；玩家之后要的牌按 counts 的比例抽，
+    不从之后的牌里去掉，也不改变庄家的分布。分牌同 split_ev() 的近似。
+    """
+    counts = fold_ranks(counts)
+    stands = stand_evs(counts, up, dealer_rule)
+    size = sum(counts)
+    probs = [count / size for count in counts]
+    hits = {}
+
+    def hit(hard, aces):
+        key = (hard, aces)
+        ev = hits.get(key)
+        if ev is None:
+            ev = 0.0
+            for index, next_hard, next_aces, total in _successors(hard, aces):
+                p = probs[index]
+                if not p:
+                    continue
+                if total > 21:
+                    ev -= p
+                else:
+                    ev += p * max(stands[total], hit(next_hard, next_aces))
+            hits[key] = ev
+        return ev
+
+    def double(hard, aces):
+        return 2 * sum(probs[index] * (-1.0 if total > 21 else stands[total])
+                       for index, _, _, total in _successors(hard, aces))
+
+    def stand(hard, aces):
+        total = hand_value(hard, aces)
+        return -1.0 if total > 21 else stands[total]
+
+    aces = min(aces, 2)
+    evs = {"stand": stand(hard, aces), "hit": hit(hard, aces)}
+    if first_two:
+        evs["double"] = double(hard, aces)
+    if pair:
+        evs["split"] = 2 * sum(
+            probs[index] * max(stand(next_hard, next_aces), hit(next_hard, next_aces),
+                               double(next_hard, next_aces))
+            for index, next_hard, next_aces, _ in _successors(pair, int(pair == 1)) if probs[index])
+    return evs
+
+
+def cache_info():
+    """各缓存的命中情况"""
+    return {"dealer": dealer_finals.cache_info(), "stand": stand_evs.cache_info(),
+            "hit": hit_ev.cache_info()}
+
+
+class CompositionAdvisor:
+    """跟着发牌实时给建议
+
+    每看到一张牌（玩家的牌、庄家的明牌）就调用 see()，
+    advise() 按还没见过的牌计算当前手牌各动作的期望并给出最优动作。
+    庄家的暗牌没翻开之前不要 see()，它和牌堆里的牌一样是未知的。
+    默认用 quick_action_evs()，每次决策在 1 ms 以内；
+    exact 为 True 时用 action_evs() 精确计算，换一种剩余牌要几十到几百毫秒。
+    """
+
+    def __init__(self, decks=1, dealer_rule=17, exact=False):
+        self.decks = decks
+        self.dealer_rule = dealer_rule
+        self.evaluate = action_evs if exact else quick_action_evs
+        self.reset()
+
+    def reset(self):
+        """重新洗牌后调用"""
+        self.counts = list(shoe_counts(self.decks))
+
+    def see(self, card):
+        self.counts[min(card.face, 10) - 1] -= 1
+
+    def advise(self, hand, up_card):
+        """返回 (最优动作, 各动作的期望)"""
+        cards = hand.cards
+        first_two = len(cards) == 2
+        pair = None
+        if first_two and min(cards[0].face, 10) == min(cards[1].face, 10):
+            pair = min(cards[0].face, 10)
+        evs = self.evaluate(tuple(self.counts), hand.hard, hand.aces,
+                            min(up_card.face, 10), self.dealer_rule, first_two, pair)
+        return max(evs, key=evs.get), evs
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from points21 import Poker, Player, Dealer
+
+    # 预热：列出庄家每种明牌的补牌组合
+    for up in range(1, 11):
+        stand_evs(shoe_counts(), up)
+
+    # 一副牌连着发下去，每次决策的剩余牌都是没见过的；照建议打，和精确计算的结果比较
+    poker = Poker(random.Random(7))
+    quick, exact = CompositionAdvisor(), CompositionAdvisor(exact=True)
+    times, agree, regret = [], 0, 0.0
+    poker.shuffle()
+    for advisor in (quick, exact):
+        advisor.reset()
+    for round_no in range(40):
+        if poker.remaining() < 20:
+            poker.shuffle()
+            for advisor in (quick, exact):
+                advisor.reset()
+        player, dealer = Player("player", verbose=False), Dealer("dealer", verbose=False)
+        player.hit(poker.deal())
+        player.hit(poker.deal())
+        dealer.hit(poker.deal())
+        up = poker.deal()
+        dealer.hit(up)
+        for card in player.cards + [up]:
+            quick.see(card)
+            exact.see(card)
+        while player.calc() <= 21:
+            start = time.perf_counter()
+            action, evs = quick.advise(player, up)
+            times.append(time.perf_counter() - start)
+            best, exact_evs = exact.advise(player, up)
+            agree += action == best
+            regret += exact_evs[best] - exact_evs[action]
+            if action not in ("hit", "double"):
+                break
+            card = poker.deal()
+            player.hit(card)
+            quick.see(card)
+            exact.see(card)
+            if action == "double":
+                break
+        # 翻开暗牌，庄家补到 17 点，这些牌也都算见过了
+        while player.calc() <= 21 and dealer.calc() < 17:
+            dealer.hit(poker.deal())
+        for card in dealer.cards[:1] + dealer.cards[2:]:
+            quick.see(card)
+            exact.see(card)
+
+    times.sort()
+    n = len(times)
+    print(f"{n} decisions on unseen compositions: median {times[n // 2] * 1000:.3f} ms, "
+          f"p90 {times[n * 9 // 10] * 1000:.3f} ms, max {times[-1] * 1000:.3f} ms")
+    print(f"same action as the exact engine in {agree}/{n}, "
+          f"EV given up {regret / n:.5f} per decision")
+    print(cache_info())
@@ -0,0 +1,128 @@
+"""21 点的算牌：流水数、真数和剩余副数
+
+Counter 通过 Poker.subscribe() 订阅发牌，每张牌只做一次查表加法，
+流水数、真数、剩余副数都是 O(1) 得到，不需要回头扫描牌堆。
+simulate_counting() 在多副牌、带切牌位置的牌靴上连续发牌，
+按真数调整下注，用来评估下注倍数的效果。
+"""
+import random
+from array import array
+
+from points21 import Poker, Player, Dealer
+from points21_policy import HitBelow, compile_policy, dealer_draws
+from points21_rules import RuleEngine
+from points21_sim import play_hand
+
+# 各算牌法对每种牌面（下标 1~13 为 A~K）的计数值，以及初始流水数的 (每副牌的部分, 常数部分)：
+# 初始流水数 = 每副牌的部分 × 副数 + 常数部分。KO 的标准起点是 4 - 4 × 副数（一副为 0，六副为 -20）
+SYSTEMS = {
+    "hi-lo": ((0, -1, 1, 1, 1, 1, 1, 0, 0, 0, -1, -1, -1, -1), (0, 0)),
+    "ko": ((0, -1, 1, 1, 1, 1, 1, 1, 0, 0, -1, -1, -1, -1), (-4, 4)),
+    "omega-ii": ((0, 0, 1, 1, 2, 2, 2, 1, 0, -1, -2, -2, -2, -2), (0, 0)),
+}
+
+# 剩余牌少于这个数就提前洗牌，保证一局内不会发空
+RESERVE = 26
+
+
+class Counter:
+    """算牌器，可以用 poker.subscribe(counter) 挂到牌靴上"""
+
+    def __init__(self, system="hi-lo", decks=1):
+        if system not in SYSTEMS:
+            raise ValueError(f"unknown counting system: {system!r}")
+        self.system = system
+        self.tags, self.initial = SYSTEMS[system]
+        self.decks = decks
+        self.size = 52 * decks
+        self.reset()
+
+    def reset(self):
+        # KO 是不平衡算法，初始流水数随副数变化
+        per_deck, offset = self.initial
+        self.running = per_deck * self.decks + offset
+        self.seen = 0
+
+    def see(self, card):
+        self.running += self.tags[card.face]
+        self.seen += 1
+
+    def decks_remaining(self):
+        """估计剩下的副数，最少按半副算，避免真数在牌靴末尾失真"""
+        return max(self.size - self.seen, 26) / 52
+
+    def true_count(self):
+        """流水数除以剩余副数；KO 不需要换算，通常直接看流水数"""
+        return self.running / self.decks_remaining()
+
+
+def bet_spread(min_units=1, max_units=8):
+    """真数每多 1 加 1 个单位、上下限为 [min_units, max_units] 的下注方式"""
+    def bet(true_count):
+        return min(max_units, max(min_units, int(true_count)))
+    return bet
+
+
+def counted_outcomes(n_rounds, system="hi-lo", decks=6, penetration=0.75,
+                     player_policy=None, dealer_rule=17, seed=None, rules=None):
+    """连续在同一个牌靴上打 n_rounds 局，返回 (每局开始前的真数, 每局以单位下注计的输赢)
+
+    两者都是 array('d')；下注不影响怎么打，所以按真数下注的结果可以事后再算。
+    rules 同 simulate()，需要黑杰克赔率、分牌或保险时每局交给 RuleEngine 打。
+    """
+    policy = compile_policy(player_policy or HitBelow(17))
+    draws = dealer_draws(dealer_rule)
+    engine = None
+    if rules is not None:
+        policy = rules.compile(policy)
+        if not rules.is_basic():
+            engine = RuleEngine(rules, policy, draws)
+
+    poker = Poker(random.Random(seed), decks, penetration)
+    counter = Counter(system, decks)
+    poker.subscribe(counter)
+    player = Player("player", verbose=False)
+    dealer = Dealer("dealer", verbose=False)
+    poker.shuffle()
+
+    true_counts = array("d", bytes(8 * n_rounds))
+    payoffs = array("d", bytes(8 * n_rounds))
+    for i in range(n_rounds):
+        if poker.needs_shuffle() or poker.remaining() < RESERVE:
+            poker.shuffle()
+        true_counts[i] = counter.true_count()
+        if engine is None:
+            payoffs[i] = play_hand(poker, player, dealer, policy, draws)
+        else:
+            payoffs[i] = engine.play(poker)
+    return true_counts, payoffs
+
+
+def simulate_counting(n_rounds, system="hi-lo", decks=6, penetration=0.75,
+                      bet=None, player_policy=None, dealer_rule=17, seed=None, rules=None):
+    """连续在同一个牌靴上打 n_rounds 局，每局开始前按真数下注
+
+    返回 {"rounds", "wagered", "net", "win", "lose", "push"}，
+    wagered 和 net 以下注单位计，net / wagered 即每单位下注的期望；rules 同 counted_outcomes()。
+    """
+    bet = bet or bet_spread()
+    true_counts, payoffs = counted_outcomes(n_rounds, system, decks, penetration,
+                                            player_policy, dealer_rule, seed, rules)
+    wagered = net = 0
+    counts = [0, 0, 0]    # 平局、玩家赢、庄家赢
+    for true_count, payoff in zip(true_counts, payoffs):
+        units = bet(true_count)
+        wagered += units
+        net += units * payoff
+        counts[(payoff > 0) + 2 * (payoff < 0)] += 1
+
+    return {"rounds": n_rounds, "wagered": wagered, "net": net,
+            "win": counts[1], "lose": counts[2], "push": counts[0]}
+
+
+if __name__ == "__main__":
+    for system in SYSTEMS:
+        flat = simulate_counting(100000, system, bet=lambda tc: 1, seed=0)
+        spread = simulate_counting(100000, system, seed=0)
+        print(f"{system:9} flat {flat['net'] / flat['wagered']:+.4f}"
+              f"  spread {spread['net'] / spread['wagered']:+.4f}")
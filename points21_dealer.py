@@ -0,0 +1,204 @@
+"""预先算好的庄家终点分布表
+
+庄家按固定规则补牌，终点分布（17~21 点或爆牌）只取决于明牌、规则和牌的组成，
+不必每手都一张张模拟。这里按明牌把分布算成表，两种情形：
+    无限副牌：每张牌的概率固定，即有放回抽牌
+    按组成：从 decks 副牌里去掉明牌后不放回抽牌（用 points21_composition 的缓存）
+peek 为 True 时表是"庄家已确认不是黑杰克"的条件分布（明牌 A 时暗牌不是 10 点牌，反之亦然），
+配合 Rules(peek=True) 使用。
+
+表存成一个 .npz 文件，DealerTableStore 启动时整个读进内存，缺的表才现算并写回，
+之后的分析（如 DealerTable.stand_evs()）直接查表，不再模拟庄家。
+"""
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from points21 import hand_value
+from points21_composition import dealer_finals as composition_finals, _without
+from points21_policy import dealer_draws
+from points21_strategy import BUST, UP_CARDS, shoe_counts
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "points21", "dealer_tables.npz")
+
+
+@lru_cache(maxsize=None)
+def _infinite_finals(hard, aces, dealer_rule):
+    """无限副牌时庄家从 (hard, aces) 开始的终点分布"""
+    total = hand_value(hard, aces)
+    dist = np.zeros(BUST + 1)
+    if total > 21:
+        dist[BUST] = 1.0
+    elif not dealer_draws(dealer_rule)[total * 3 + (total - hard) // 9]:
+        dist[total] = 1.0
+    else:
+        for value, count in zip(UP_CARDS, shoe_counts()):
+            dist += count / 52 * _infinite_finals(hard + value, min(aces + (value == 1), 2), dealer_rule)
+    dist.flags.writeable = False
+    return dist
+
+
+def _excluded_hole(up, peek):
+    """peek 时暗牌不可能是哪个点数（会组成黑杰克的那张），否则为 None"""
+    if peek and up == 1:
+        return 10
+    if peek and up == 10:
+        return 1
+    return None
+
+
+def build_table(dealer_rule=17, decks=None, peek=False):
+    """算出一张 DealerTable；decks 为 None 时按无限副牌算"""
+    finals = np.zeros((11, BUST + 1))
+    for up in UP_CARDS:
+        excluded = _excluded_hole(up, peek)
+        if decks is None:
+            holes = [(value, count / 52) for value, count in zip(UP_CARDS, shoe_counts())]
+        else:
+            counts = _without(shoe_counts(decks), up)
+            holes = [(value, count / sum(counts)) for value, count in zip(UP_CARDS, counts)]
+        holes = [(value, p) for value, p in holes if p and value != excluded]
+        norm = sum(p for _, p in holes)
+        for hole, p in holes:
+            hard, aces = up + hole, (up == 1) + (hole == 1)
+            if decks is None:
+                dist = _infinite_finals(hard, aces, dealer_rule)
+            else:
+                dist = composition_finals(_without(counts, hole), hard, aces, dealer_rule)
+            finals[up] += p / norm * np.asarray(dist)
+    return DealerTable(finals, dealer_rule, decks, peek)
+
+
+def table_key(dealer_rule=17, decks=None, peek=False):
+    """表在文件里的名称，如 "infinite-17"、"6deck-H17-peek" """
+    key = f"{'infinite' if decks is None else f'{decks}deck'}-{str(dealer_rule).upper()}"
+    return key + "-peek" if peek else key
+
+
+class DealerTable:
+    """一张庄家终点分布表，finals[up, final] 是明牌为 up 时停在 final 点的概率（下标 22 为爆牌）"""
+
+    def __init__(self, finals, dealer_rule=17, decks=None, peek=False):
+        self.finals = np.asarray(finals, dtype=float)
+        self.dealer_rule = dealer_rule
+        self.decks = decks
+        self.peek = peek
+        # 逐个查停牌期望时用普通的嵌套列表，免得每次都切 numpy 数组
+        self._stand = self.stand_evs().tolist()
+
+    def __repr__(self):
+        return f"DealerTable({table_key(self.dealer_rule, self.decks, self.peek)!r})"
+
+    def bust(self, up):
+        return float(self.finals[up, BUST])
+
+    def stand_ev(self, total, up):
+        """以 total 点停牌、庄家明牌为 up 时的期望"""
+        if total > 21:
+            return -1.0
+        return self._stand[total][up]
+
+    def stand_evs(self):
+        """所有 (total, up) 的停牌期望，形状 (22, 11)，total 超过 21 的行不在表内"""
+        dist = self.finals
+        below = np.cumsum(dist[:, :BUST], axis=1)
+        win = dist[:, BUST:BUST + 1] + np.concatenate([np.zeros((11, 1)), below[:, :-1]], axis=1)
+        lose = below[:, -1:] - below
+        return (win - lose)[:, :22].T
+
+    def format(self):
+        """按明牌列出 17~21 点和爆牌的概率"""
+        lines = ["up     " + " ".join(f"{final:>6}" for final in range(17, 22)) + "   bust"]
+        for up in UP_CARDS:
+            row = self.finals[up]
+            label = "A" if up == 1 else str(up)
+            lines.append(f"{label:6} " + " ".join(f"{p:6.3f}" for p in row[17:22]) + f" {row[BUST]:6.3f}")
+        return "\n".join(lines)
+
+
+class DealerTableStore:
+    """存在一个 .npz 文件里的一组 DealerTable
+
+    创建时把文件整个读进内存；get() 要的表不在文件里就现算，并把整个文件重新写一遍。
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.arrays = {}
+        if os.path.exists(path):
+            with np.load(path) as data:
+                self.arrays = {key: data[key] for key in data.files}
+
+    def get(self, dealer_rule=17, decks=None, peek=False):
+        key = table_key(dealer_rule, decks, peek)
+        if key not in self.arrays:
+            self.arrays[key] = build_table(dealer_rule, decks, peek).finals
+            self.save()
+        return DealerTable(self.arrays[key], dealer_rule, decks, peek)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先写临时文件再改名，中途出错不会留下写了一半的表
+        temp = self.path + ".tmp.npz"
+        np.savez(temp, **self.arrays)
+        os.replace(temp, self.path)
+
+    def build_all(self, dealer_rules=(17, "H17"), decks=(None, 1, 2, 6, 8), peek=(False, True)):
+        """把常用的表都算好存起来"""
+        for rule in dealer_rules:
+            for deck in decks:
+                for p in peek:
+                    key = table_key(rule, deck, p)
+                    if key not in self.arrays:
+                        self.arrays[key] = build_table(rule, deck, p).finals
+        self.save()
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    path = os.path.join(tempfile.gettempdir(), "points21_dealer_tables.npz")
+    if os.path.exists(path):
+        os.remove(path)
+
+    start = time.perf_counter()
+    DealerTableStore(path).build_all()
+    print(f"built tables in {time.perf_counter() - start:.2f} s, {os.path.getsize(path):,} bytes")
+
+    start = time.perf_counter()
+    store = DealerTableStore(path)
+    table = store.get(17, 1)
+    print(f"loaded {len(store.arrays)} tables in {(time.perf_counter() - start) * 1000:.2f} ms\n")
+    print(table)
+    print(table.format())
+
+    # 与逐手模拟庄家补牌比较：明牌为 6、单副牌时的爆牌率
+    from points21 import Poker, Dealer, CARDS
+
+    poker, dealer, draws = Poker(), Dealer("dealer", verbose=False), dealer_draws(17)
+    rest = bytearray(poker.deck)
+    rest.remove(6)
+    busts, n = 0, 200000
+    for _ in range(n):
+        poker.load(rest)
+        poker.shuffle()
+        dealer.clear()
+        dealer.hit(CARDS[6])
+        total = dealer.calc()
+        while draws[total * 3 + (total - dealer.hard) // 9]:
+            dealer.hit(poker.deal())
+            total = dealer.calc()
+        busts += total > 21
+    print(f"\nup 6 bust rate: table {table.bust(6):.4f}, simulated {busts / n:.4f}")
+
+    # 查表求策略：停牌期望不再递归算庄家
+    from points21_strategy import solve
+
+    start = time.perf_counter()
+    solve(dealer_table=store.get(17))
+    print(f"solved with a precomputed table in {(time.perf_counter() - start) * 1000:.1f} ms")
+    os.remove(path)
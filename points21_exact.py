@@ -0,0 +1,195 @@
+"""单副牌 21 点的穷举：给定策略下各种输赢的精确概率
+
+simulate() 每手都用一副新洗的牌，按玩家两张、庄家暗牌、庄家明牌的顺序发牌，
+之后玩家按策略要牌，没爆牌、没投降时庄家再补牌。
+这里把所有可能的发牌顺序都走一遍（不放回抽牌），
+手牌结束（爆牌、停牌、投降）后不再往下展开，
+并以 (剩余牌的张数, 手牌状态) 为键把子树的结果存进置换表，
+不同顺序走到同一个局面时只算一次。结果可以当作蒙特卡洛模拟的标准答案。
+"""
+from fractions import Fraction
+
+from points21 import hand_value
+from points21_policy import (STAND, HIT, DOUBLE, SURRENDER, HitBelow,
+                             compile_policy, dealer_draws, table_index)
+from points21_strategy import BUST, shoe_counts
+
+# 一手牌可能的输赢，以下注为单位；outcome 向量按这个顺序排
+PAYOFFS = (-2, -1, -0.5, 0, 1, 2)
+
+
+def _without(counts, value):
+    return counts[:value - 1] + (counts[value - 1] - 1,) + counts[value:]
+
+
+class ExactGame:
+    """对一个固定策略穷举所有发牌顺序
+
+    decks 是牌的副数，默认与 simulate() 一样为一副；
+    exact 为 True 时用 Fraction 计算，得到没有舍入误差的分数，慢几倍。
+    """
+
+    def __init__(self, player_policy=None, dealer_rule=17, decks=1, exact=False):
+        self.policy = compile_policy(player_policy or HitBelow(17))
+        self.draws = dealer_draws(dealer_rule)
+        self.counts = shoe_counts(decks)
+        self.exact = exact
+        self.zero = Fraction(0) if exact else 0.0
+        # 置换表：庄家终点分布、玩家要牌阶段的输赢分布
+        self._dealer = {}
+        self._player = {}
+
+    def _prob(self, count, size):
+        return Fraction(count, size) if self.exact else count / size
+
+    def _deal(self, counts):
+        """剩余牌里每种点数被抽到的 (点数, 概率, 抽走后的张数)"""
+        size = sum(counts)
+        return [(value, self._prob(count, size), _without(counts, value))
+                for value, count in enumerate(counts, 1) if count]
+
+    def dealer_finals(self, counts, hard, aces):
+        """庄家从 (hard, aces) 开始从 counts 里补牌，返回终点分布（下标 22 为爆牌）"""
+        key = (counts, hard, aces)
+        dist = self._dealer.get(key)
+        if dist is not None:
+            return dist
+        total = hand_value(hard, aces)
+        dist = [self.zero] * (BUST + 1)
+        if total > 21:
+            dist[BUST] += 1
+        elif not self.draws[total * 3 + (total - hard) // 9] or not any(counts):
+            dist[total] += 1
+        else:
+            for value, p, rest in self._deal(counts):
+                sub = self.dealer_finals(rest, hard + value, min(aces + (value == 1), 2))
+                for final, q in enumerate(sub):
+                    if q:
+                        dist[final] += p * q
+        self._dealer[key] = dist
+        return dist
+
+    def _settle(self, counts, total, stake, dealer):
+        """玩家以 total 点、stake 倍下注停下后的输赢分布"""
+        outcome = [self.zero] * len(PAYOFFS)
+        if total > 21:
+            outcome[PAYOFFS.index(-stake)] += 1
+            return outcome
+        dist = self.dealer_finals(counts, *dealer)
+        win = dist[BUST] + sum(dist[:total])
+        lose = sum(dist[total + 1:BUST])
+        outcome[PAYOFFS.index(stake)] = win
+        outcome[PAYOFFS.index(-stake)] = lose
+        outcome[PAYOFFS.index(0)] = dist[total]
+        return outcome
+
+    def _hitting(self, counts, hard, aces, dealer, up):
+        """玩家已经要过牌、手里是 (hard, aces) 时，之后的输赢分布"""
+        key = (counts, hard, aces, dealer, up)
+        outcome = self._player.get(key)
+        if outcome is not None:
+            return outcome
+        total = hand_value(hard, aces)
+        if total > 21 or not self.policy.later[table_index(total, (total - hard) // 9, up)]:
+            outcome = self._settle(counts, total, 1, dealer)
+        else:
+            outcome = self._draw(counts, hard, aces, dealer, up, self._hitting)
+        self._player[key] = outcome
+        return outcome
+
+    def _doubled(self, counts, hard, aces, dealer, up):
+        return self._settle(counts, hand_value(hard, aces), 2, dealer)
+
+    def _draw(self, counts, hard, aces, dealer, up, then):
+        """玩家抽一张牌，再按 then 继续，返回按概率加权的输赢分布"""
+        outcome = [self.zero] * len(PAYOFFS)
+        for value, p, rest in self._deal(counts):
+            sub = then(rest, hard + value, min(aces + (value == 1), 2), dealer, up)
+            for i, q in enumerate(sub):
+                if q:
+                    outcome[i] += p * q
+        return outcome
+
+    def _play(self, counts, hard, aces, dealer, up):
+        """头两张牌和庄家的两张都发完后，按策略打完这一手"""
+        total = hand_value(hard, aces)
+        action = self.policy.first[table_index(total, (total - hard) // 9, up)]
+        if action == SURRENDER:
+            outcome = [self.zero] * len(PAYOFFS)
+            outcome[PAYOFFS.index(-0.5)] += 1
+            return outcome
+        if action == STAND:
+            return self._settle(counts, total, 1, dealer)
+        if action == DOUBLE:
+            return self._draw(counts, hard, aces, dealer, up, self._doubled)
+        if action == HIT:
+            return self._draw(counts, hard, aces, dealer, up, self._hitting)
+        raise ValueError(f"unsupported first action: {action}")
+
+    def outcomes(self):
+        """返回 {输赢: 概率}，概率之和为 1"""
+        total = [self.zero] * len(PAYOFFS)
+        for first, p1, counts1 in self._deal(self.counts):
+            for second, p2, counts2 in self._deal(counts1):
+                hard, aces = first + second, (first == 1) + (second == 1)
+                for hole, p3, counts3 in self._deal(counts2):
+                    for up, p4, counts4 in self._deal(counts3):
+                        dealer = (hole + up, (hole == 1) + (up == 1))
+                        p = p1 * p2 * p3 * p4
+                        for i, q in enumerate(self._play(counts4, hard, aces, dealer, up)):
+                            if q:
+                                total[i] += p * q
+        return dict(zip(PAYOFFS, total))
+
+    def table_sizes(self):
+        """两张置换表各存了多少个局面"""
+        return {"dealer": len(self._dealer), "player": len(self._player)}
+
+
+def summarize_outcomes(outcomes):
+    """由 {输赢: 概率} 得到 {"win", "lose", "push", "ev", "std", "outcomes"}，前三项是概率"""
+    ev = sum(payoff * p for payoff, p in outcomes.items())
+    second = sum(payoff * payoff * p for payoff, p in outcomes.items())
+    return {"win": sum(p for payoff, p in outcomes.items() if payoff > 0),
+            "lose": sum(p for payoff, p in outcomes.items() if payoff < 0),
+            "push": outcomes[0], "ev": ev, "std": float(second - ev * ev) ** 0.5,
+            "outcomes": outcomes}
+
+
+def exact_result(player_policy=None, dealer_rule=17, decks=1, exact=False):
+    """穷举 player_policy 的所有发牌顺序，返回 summarize_outcomes() 的结果"""
+    return summarize_outcomes(ExactGame(player_policy, dealer_rule, decks, exact).outcomes())
+
+
+def z_scores(result, exact):
+    """模拟结果与穷举结果的偏差，以标准误为单位，{"win", "lose", "push", "ev"}
+
+    各项的绝对值都应该在 3 以内，大了说明模拟有误。
+    """
+    n = result["hands"]
+    scores = {}
+    for key in ("win", "lose", "push"):
+        p = float(exact[key])
+        scores[key] = (result[key] / n - p) / (p * (1 - p) / n) ** 0.5 if 0 < p < 1 else 0.0
+    scores["ev"] = (result["net"] / n - float(exact["ev"])) / (exact["std"] / n ** 0.5)
+    return scores
+
+
+if __name__ == "__main__":
+    import time
+
+    from points21_sim import simulate
+    from points21_strategy import solve
+
+    for name, policy in (("hit below 17", None), ("basic strategy", solve())):
+        start = time.perf_counter()
+        game = ExactGame(policy)
+        outcomes = game.outcomes()
+        elapsed = time.perf_counter() - start
+        exact = summarize_outcomes(outcomes)
+        print(f"{name}: enumerated in {elapsed:.1f} s, {game.table_sizes()}")
+        print("  " + ", ".join(f"{payoff:+g}: {p:.6f}" for payoff, p in outcomes.items()))
+        print(f"  exact EV {exact['ev']:+.6f}")
+        result = simulate(2000000, policy, seed=0, engine="array")
+        scores = z_scores(result, exact)
+        print("  Monte Carlo z-scores: " + ", ".join(f"{k} {v:+.2f}" for k, v in scores.items()))
@@ -0,0 +1,267 @@
+"""21 点的牌局记录：紧凑的二进制格式、带缓冲的写入和基于 mmap 的回放
+
+文件开头是 24 字节的文件头：
+    b"P21H"、版本号（1 字节）、3 字节保留、主种子（16 字节无符号小端整数）
+之后是一个个数据块，每块最多 BLOCK_HANDS 手牌，块头 16 字节（全部小端）：
+    u32 手数 n，u32 块内数据的字节数，u64 本块第一手的编号
+块内数据按列存放：
+    u32 × n  手牌编号相对块头编号的增量
+    i8 × n   输赢，以半个下注单位计（投降 -1，加倍赢 +4）
+    u8 × n   每手发出的牌数，u8 × n 每手的决定数
+    之后依次是所有牌面（1~13，按发牌顺序）和所有决定（STAND/HIT 等常量）
+一手牌平均十几个字节，十亿手也只要十几 GB。
+读取时把文件映射进内存，各列直接用 numpy 视图访问：
+统计输赢只碰输赢那一列，速度接近磁盘带宽；逐手回放时才按需切出每手的牌。
+"""
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from points21 import Poker, Player, Dealer
+from points21_policy import HitBelow, compile_policy, dealer_draws
+from points21_rules import RuleEngine
+from points21_sim import CHUNK, split_blocks, deal_block, play_hand, as_result
+
+MAGIC = b"P21H"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sB3x16s")
+BLOCK_HEADER = struct.Struct("<IIQ")
+# 每块最多的手数，也是写入时在内存里攒着的上限
+BLOCK_HANDS = 1 << 16
+
+HandRecord = namedtuple("HandRecord", "hand_id cards decisions payoff")
+
+
+class HistoryWriter:
+    """按顺序追加牌局记录，攒满一块才写盘，用法：
+
+        with HistoryWriter("hands.p21h", seed) as log:
+            log.write(hand_id, cards, decisions, payoff)
+    """
+
+    def __init__(self, path, seed=0):
+        self.file = open(path, "wb")
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, int(seed).to_bytes(16, "little")))
+        self.hands = 0
+        self._reset_block()
+
+    def _reset_block(self):
+        self.base = None
+        self.ids = array("I")
+        self.payoffs = array("b")
+        self.n_cards = array("B")
+        self.n_decisions = array("B")
+        self.cards = bytearray()
+        self.decisions = bytearray()
+
+    def write(self, hand_id, cards, decisions, payoff):
+        """cards、decisions 是字节串或小整数序列，payoff 以下注为单位，必须是 0.5 的整数倍"""
+        if payoff * 2 != int(payoff * 2):
+            # 文件里以半个下注单位存整数，6:5 的黑杰克赔率（1.2）这样的输赢存不下
+            raise ValueError(f"payoff must be a multiple of 0.5, got {payoff}")
+        # 编号增量放不进 u32 时另起一块
+        if self.base is not None and not 0 <= hand_id - self.base < 1 << 32:
+            self.flush()
+        if self.base is None:
+            self.base = hand_id
+        self.ids.append(hand_id - self.base)
+        self.payoffs.append(int(payoff * 2))
+        self.n_cards.append(len(cards))
+        self.n_decisions.append(len(decisions))
+        self.cards += bytes(cards)
+        self.decisions += bytes(decisions)
+        self.hands += 1
+        if len(self.ids) >= BLOCK_HANDS:
+            self.flush()
+
+    def flush(self):
+        """把攒着的记录作为一块写出去"""
+        if not self.ids:
+            return
+        columns = (self.ids.tobytes(), self.payoffs.tobytes(), self.n_cards.tobytes(),
+                   self.n_decisions.tobytes(), bytes(self.cards), bytes(self.decisions))
+        self.file.write(BLOCK_HEADER.pack(len(self.ids), sum(map(len, columns)), self.base))
+        for column in columns:
+            self.file.write(column)
+        self._reset_block()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HistoryReader:
+    """把记录文件映射进内存，按块给出各列的 numpy 视图，或逐手给出 HandRecord"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, seed = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} hand history")
+        self.seed = int.from_bytes(seed, "little")
+
+    def blocks(self):
+        """逐块给出 {"hand_id", "payoff", "n_cards", "n_decisions", "cards", "decisions"}
+
+        各列都是直接指向映射内存的 numpy 数组，不复制数据；payoff 以半个下注单位计。
+        这些数组在 close() 之后仍然可用，映射要等最后一个数组被回收才真正释放；
+        需要长期保存的列请 copy()，免得整个文件一直映射在内存里。
+        """
+        data, offset, end = self.data, FILE_HEADER.size, len(self.data)
+        while offset < end:
+            n, size, base = BLOCK_HEADER.unpack_from(data, offset)
+            offset += BLOCK_HEADER.size
+            ids = np.frombuffer(data, np.uint32, n, offset)
+            payoff = np.frombuffer(data, np.int8, n, offset + 4 * n)
+            n_cards = np.frombuffer(data, np.uint8, n, offset + 5 * n)
+            n_decisions = np.frombuffer(data, np.uint8, n, offset + 6 * n)
+            total_cards = int(n_cards.sum(dtype=np.int64))
+            cards = np.frombuffer(data, np.uint8, total_cards, offset + 7 * n)
+            decisions = np.frombuffer(data, np.uint8, size - 7 * n - total_cards,
+                                      offset + 7 * n + total_cards)
+            yield {"hand_id": base + ids.astype(np.uint64), "payoff": payoff,
+                   "n_cards": n_cards, "n_decisions": n_decisions,
+                   "cards": cards, "decisions": decisions}
+            offset += size
+
+    def __iter__(self):
+        for block in self.blocks():
+            card_ends = np.cumsum(block["n_cards"], dtype=np.int64).tolist()
+            decision_ends = np.cumsum(block["n_decisions"], dtype=np.int64).tolist()
+            cards, decisions = block["cards"], block["decisions"]
+            card_start = decision_start = 0
+            for hand_id, half, card_end, decision_end in zip(
+                    block["hand_id"].tolist(), block["payoff"].tolist(), card_ends, decision_ends):
+                yield HandRecord(hand_id, cards[card_start:card_end].tobytes(),
+                                 decisions[decision_start:decision_end].tobytes(), half / 2)
+                card_start, decision_start = card_end, decision_end
+
+    def summary(self):
+        """只读输赢那一列，统计出与 simulate() 相同格式的结果"""
+        counts = [0, 0, 0, 0, 0]
+        for block in self.blocks():
+            payoff = block["payoff"]
+            win, lose = int(np.count_nonzero(payoff > 0)), int(np.count_nonzero(payoff < 0))
+            counts[0] += len(payoff) - win - lose
+            counts[1] += win
+            counts[2] += lose
+            counts[3] += int(payoff.sum(dtype=np.int64))
+            counts[4] += int(np.square(payoff, dtype=np.int64).sum())
+        # 记录里存的是半个单位
+        counts[3] /= 2
+        counts[4] /= 4
+        return as_result(sum(counts[:3]), counts)
+
+    def close(self):
+        if self.data is not None:
+            try:
+                self.data.close()
+            except BufferError:
+                # blocks() 给出的数组还引用着映射，交给垃圾回收在它们都被回收后释放
+                pass
+            self.data = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _hand_player(policy, draws, rules):
+    """返回 play(poker, decisions) -> 输赢：按 rules 时交给 RuleEngine，否则是 play_hand"""
+    if rules is not None and not rules.is_basic():
+        return RuleEngine(rules, policy, draws).play
+    player = Player("player", verbose=False)
+    dealer = Dealer("dealer", verbose=False)
+    return lambda poker, decisions: play_hand(poker, player, dealer, policy, draws, decisions)
+
+
+def record_simulation(path, n_hands, player_policy=None, dealer_rule=17, seed=None, rules=None):
+    """和 simulate(engine="object") 一样打 n_hands 手牌，同时把每手写进 path
+
+    seed 为 None 时随机生成一个并写进文件头，之后仍然能复现。
+    rules 同 simulate()；文件里的输赢以半个下注单位存，黑杰克赔率要是 0.5 的整数倍。
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    policy = compile_policy(player_policy or HitBelow(17))
+    if rules is not None:
+        policy = rules.compile(policy)
+    draws = dealer_draws(dealer_rule)
+    play = _hand_player(policy, draws, rules)
+
+    poker = Poker()
+    decisions = []
+    counts = [0, 0, 0, 0, 0]
+    with HistoryWriter(path, seed) as log:
+        for block_no, (size, seed_seq) in enumerate(split_blocks(n_hands, seed)):
+            shoes = deal_block(size, seed_seq)
+            width = shoes.shape[1]
+            buf = shoes.tobytes()
+            for row in range(size):
+                start = row * width
+                poker.load(buf[start:start + width])
+                decisions.clear()
+                payoff = play(poker, decisions)
+                log.write(block_no * CHUNK + row, buf[start:start + poker.current], decisions, payoff)
+                counts[(payoff > 0) + 2 * (payoff < 0)] += 1
+                counts[3] += payoff
+                counts[4] += payoff * payoff
+    return as_result(n_hands, counts)
+
+
+def replay(records, player_policy=None, dealer_rule=17, rules=None):
+    """用记录里的牌重新打一遍，逐手给出 (记录, 输赢, 决定的字节串)，可以用来核对记录"""
+    policy = compile_policy(player_policy or HitBelow(17))
+    if rules is not None:
+        policy = rules.compile(policy)
+    play = _hand_player(policy, dealer_draws(dealer_rule), rules)
+    poker = Poker()
+    decisions = []
+    for record in records:
+        poker.load(record.cards)
+        decisions.clear()
+        payoff = play(poker, decisions)
+        yield record, payoff, bytes(decisions)
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import time
+
+    from points21_sim import simulate
+
+    path = os.path.join(tempfile.gettempdir(), "points21_history.p21h")
+    start = time.perf_counter()
+    result = record_simulation(path, 200000, seed=0)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"recorded {result['hands']:,} hands in {elapsed:.2f} s, "
+          f"{size / result['hands']:.1f} bytes/hand")
+
+    with HistoryReader(path) as history:
+        start = time.perf_counter()
+        summary = history.summary()
+        elapsed = time.perf_counter() - start
+        print(f"summary in {elapsed:.2f} s ({size / elapsed / 1e6:,.0f} MB/s): {summary}")
+        print("matches simulate():", summary == simulate(200000, seed=0))
+        start = time.perf_counter()
+        ok = all((payoff, decisions) == (record.payoff, record.decisions)
+                 for record, payoff, decisions in replay(history))
+        elapsed = time.perf_counter() - start
+        print(f"replayed every hand in {elapsed:.2f} s, all match: {ok}")
+    os.remove(path)
@@ -0,0 +1,175 @@
+"""玩家策略与庄家规则
+
+玩家策略可以是函数，也可以是策略表，都会编译成 Policy：
+按 (点数, 软牌, 庄家明牌) 排好的扁平查找表，模拟时每次决策只查一次表，
+不再调用 Python 函数或走分支。庄家规则（S17/H17 或停牌点数）同样编译成查找表。
+"""
+from functools import lru_cache
+
+import numpy as np
+
+STAND, HIT, DOUBLE, SPLIT, SURRENDER = range(5)
+ACTION_NAMES = ("stand", "hit", "double", "split", "surrender")
+# 策略表常用的字母写法，第二个字母是不允许该动作时的替代，如 "Dh" 不能加倍就要牌
+LETTERS = {"S": STAND, "H": HIT, "D": DOUBLE, "P": SPLIT, "R": SURRENDER}
+
+# 查找表覆盖的点数上限；庄家最多到 16 点再补一张 10，所以 31 足够
+MAX_TOTAL = 31
+
+
+def table_index(total, soft, up):
+    """(点数, 软牌, 庄家明牌) 在扁平策略表里的下标，标量和数组都能用"""
+    return (total * 3 + soft) * 11 + up
+
+
+def pair_index(value, up):
+    """(对子点数, 庄家明牌) 在分牌表里的下标"""
+    return value * 11 + up
+
+
+TABLE_SIZE = table_index(21, 2, 10) + 1
+PAIR_SIZE = pair_index(10, 10) + 1
+
+
+def table_states():
+    """查找表里所有的 (点数, 软牌, 庄家明牌)，包括实际到不了的状态"""
+    return [(total, soft, up)
+            for total in range(2, 22) for soft in range(3) for up in range(1, 11)]
+
+
+@lru_cache(maxsize=None)
+def dealer_draws(rule=17):
+    """把庄家规则编译成元组，draws[total * 3 + soft] 为 True 表示庄家还要补牌
+
+    rule 可以是停牌点数（如 17，即软 17 也停），也可以是 "S17" / "H17"，
+    H17 表示庄家遇到软 17 还要补牌。
+    """
+    hit_soft = False
+    if isinstance(rule, str):
+        if rule.upper() not in ("S17", "H17"):
+            raise ValueError(f"unknown dealer rule: {rule!r}")
+        hit_soft = rule.upper() == "H17"
+        rule = 17
+    return tuple(total < rule or (hit_soft and total == rule and soft > 0)
+                 for total in range(MAX_TOTAL + 1) for soft in range(3))
+
+
+class HitBelow:
+    """点数小于 points 就要牌的简单策略
+
+    写成类而不是闭包，是为了能被 pickle 传给其他进程。
+    """
+
+    def __init__(self, points):
+        self.points = points
+
+    def __call__(self, total, soft, up):
+        return total < self.points
+
+
+class Policy:
+    """编译好的玩家策略
+
+    first 是头两张牌时的动作（STAND/HIT/DOUBLE/SURRENDER），
+    later 是之后每次是否要牌，pairs 是对子是否分牌，都是按下标排好的 bytes。
+    实例本身可以当作 (total, soft, up) -> 是否要牌 的函数用，标量和数组都行。
+    """
+
+    def __init__(self, first, later, pairs=None, name=""):
+        self.first = bytes(first)
+        self.later = bytes(later)
+        self.pairs = bytes(pairs) if pairs is not None else bytes(PAIR_SIZE)
+        self.name = name
+        # 给数组引擎用的只读视图，不额外复制
+        self.first_array = np.frombuffer(self.first, dtype=np.uint8)
+        self.later_array = np.frombuffer(self.later, dtype=bool)
+        self.pairs_array = np.frombuffer(self.pairs, dtype=bool)
+
+    def __call__(self, total, soft, up):
+        return self.later_array[table_index(total, soft, up)]
+
+    def __repr__(self):
+        return f"Policy({self.name!r})"
+
+    def __reduce__(self):
+        return Policy, (self.first, self.later, self.pairs, self.name)
+
+    @classmethod
+    def from_callables(cls, hit, double=None, surrender=None, split=None, name=""):
+        """由若干 (total, soft, up) -> bool 的函数编译策略
+
+        只给 hit 时就是只会要牌/停牌的策略；double、surrender 只在头两张牌时考虑，
+        split(value, up) 决定对子是否分牌。
+        """
+        first = bytearray(TABLE_SIZE)
+        later = bytearray(TABLE_SIZE)
+        for total, soft, up in table_states():
+            index = table_index(total, soft, up)
+            later[index] = bool(hit(total, soft, up))
+            if surrender is not None and surrender(total, soft, up):
+                first[index] = SURRENDER
+            elif double is not None and double(total, soft, up):
+                first[index] = DOUBLE
+            else:
+                first[index] = later[index]
+        pairs = bytearray(PAIR_SIZE)
+        if split is not None:
+            for value in range(1, 11):
+                for up in range(1, 11):
+                    pairs[pair_index(value, up)] = bool(split(value, up))
+        return cls(first, later, pairs, name or getattr(hit, "__name__", ""))
+
+    @classmethod
+    def from_table(cls, actions, pairs=None, default=None, name=""):
+        """由策略表编译策略
+
+        actions 是 {(total, soft, up): 动作}，动作可以是 STAND 等常量、
+        "stand" 等名称或 "S"/"H"/"Dh"/"Ds"/"Rh" 等字母；
+        pairs 是 {(value, up): 是否分牌}；表里没有的状态由 default(total, soft, up) 决定要不要牌，
+        默认不到 17 点就要。
+        """
+        default = default or HitBelow(17)
+        first = bytearray(TABLE_SIZE)
+        later = bytearray(TABLE_SIZE)
+        for total, soft, up in table_states():
+            index = table_index(total, soft, up)
+            later[index] = first[index] = bool(default(total, soft, up))
+        for (total, soft, up), action in actions.items():
+            index = table_index(total, soft, up)
+            first[index], later[index] = _parse_action(action)
+        split = bytearray(PAIR_SIZE)
+        for (value, up), yes in (pairs or {}).items():
+            split[pair_index(value, up)] = bool(yes)
+        return cls(first, later, split, name)
+
+
+def _parse_action(action):
+    """把一格策略表解析成 (头两张牌时的动作, 之后是否要牌)"""
+    if isinstance(action, str) and action.lower() in ACTION_NAMES:
+        action = ACTION_NAMES.index(action.lower())
+    if isinstance(action, str):
+        first = LETTERS[action[0].upper()]
+        fallback = LETTERS[action[1].upper()] if len(action) > 1 else None
+    else:
+        first, fallback = action, None
+    if first == SPLIT:
+        raise ValueError("split decisions belong in the pairs table")
+    if first in (STAND, HIT):
+        return first, first
+    # 加倍、投降只能在头两张牌时做，之后按替代动作，默认要牌
+    return first, (HIT if fallback is None else fallback) == HIT
+
+
+def compile_policy(policy):
+    """把各种写法的策略统一成 Policy
+
+    可以是 Policy 本身、带 policy() 方法的对象（如 StrategyTable），
+    或 (total, soft, up) -> 是否要牌 的函数。
+    """
+    if isinstance(policy, Policy):
+        return policy
+    if hasattr(policy, "policy"):
+        return policy.policy()
+    if callable(policy):
+        return Policy.from_callables(policy)
+    raise TypeError(f"cannot use {policy!r} as a player policy")
@@ -0,0 +1,119 @@
+"""按阶段统计对象引擎的耗时
+
+默认什么都不做，游戏代码里没有任何计时的判断。
+调用 Profiler.enable() 时才把 Poker.deal、Player.hit、Dealer.hit、Hand.calc
+以及 points21_sim 里的庄家补牌（dealer_play）和结算（settle）换成带计时的版本，
+disable() 再换回原来的函数，所以不开启时没有额外开销。
+
+    with Profiler() as prof:
+        simulate(100000, seed=0)
+    print(prof.table())
+
+耗时是每次调用从进入到返回的纳秒数之和，包含内部调用，
+例如 dealer_play 的时间里含有它调用的 deal、hit 和 calc。
+"""
+import json
+import time
+
+import points21
+import points21_sim
+
+# (所在的类或模块, 属性名, 报告里的名称)
+TARGETS = (
+    (points21.Poker, "deal", "Poker.deal"),
+    (points21.Player, "hit", "Player.hit"),
+    (points21.Dealer, "hit", "Dealer.hit"),
+    (points21.Hand, "calc", "Hand.calc"),
+    (points21_sim, "dealer_play", "dealer_play"),
+    (points21_sim, "settle", "settle"),
+)
+
+
+class Profiler:
+    """记录 TARGETS 里各函数的调用次数和累计纳秒数
+
+    同一时间只应有一个 Profiler 处于开启状态。
+    """
+
+    def __init__(self, targets=TARGETS):
+        self.targets = targets
+        self.stats = {name: [0, 0] for _, _, name in targets}
+        self._originals = []
+
+    def _wrap(self, func, record):
+        clock = time.perf_counter_ns
+
+        def timed(*args):
+            start = clock()
+            result = func(*args)
+            record[1] += clock() - start
+            record[0] += 1
+            return result
+        timed.__wrapped__ = func
+        return timed
+
+    def enable(self):
+        if self._originals:
+            return
+        for owner, attr, name in self.targets:
+            # 只取类自己定义的，子类继承来的方法不会重复计时
+            func = owner.__dict__[attr]
+            self._originals.append((owner, attr, func))
+            setattr(owner, attr, self._wrap(func, self.stats[name]))
+
+    def disable(self):
+        for owner, attr, func in reversed(self._originals):
+            setattr(owner, attr, func)
+        self._originals.clear()
+
+    def reset(self):
+        for record in self.stats.values():
+            record[0] = record[1] = 0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def results(self):
+        """{名称: {"calls", "total_ns", "mean_ns"}}"""
+        return {name: {"calls": calls, "total_ns": ns, "mean_ns": ns / calls if calls else 0.0}
+                for name, (calls, ns) in self.stats.items()}
+
+    def to_json(self, path=None):
+        """返回 JSON 字符串，给了 path 时同时写进文件"""
+        text = json.dumps(self.results(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def table(self):
+        """按累计耗时从多到少排好的文本表格"""
+        lines = [f"{'name':14} {'calls':>12} {'total ms':>12} {'ns/call':>10}"]
+        rows = sorted(self.results().items(), key=lambda item: -item[1]["total_ns"])
+        for name, row in rows:
+            lines.append(f"{name:14} {row['calls']:>12,} {row['total_ns'] / 1e6:>12.1f} {row['mean_ns']:>10.0f}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from points21_sim import simulate
+
+    start = time.perf_counter()
+    simulate(100000, seed=0)
+    plain = time.perf_counter() - start
+
+    with Profiler() as prof:
+        start = time.perf_counter()
+        simulate(100000, seed=0)
+        profiled = time.perf_counter() - start
+    print(prof.table())
+    print(f"\n100,000 hands: {plain:.2f} s plain, {profiled:.2f} s profiled")
+
+    # 关闭后函数已经换回原样
+    start = time.perf_counter()
+    simulate(100000, seed=0)
+    print(f"after disable: {time.perf_counter() - start:.2f} s")
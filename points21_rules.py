@@ -0,0 +1,279 @@
+"""牌桌规则：黑杰克赔率、加倍、分牌、投降、保险
+
+《21 Points.py》只比点数。真实牌桌还有这些规则，Rules 把它们集中在一个对象里，
+模拟之前编译进引擎：
+    加倍、投降的限制直接改写进 Policy 的 first 表，模拟时不多一次判断；
+    天然黑杰克、保险、分牌由 RuleEngine 处理，只有用到这些规则时才走这条路，
+    基本的手牌仍然走 points21_sim.play_hand，速度不受影响。
+
+这个游戏里 A 先按 10 点算，A 加一张 10 点牌只有 20 点，两张牌不可能凑到 21 点，
+所以"天然黑杰克"定义为头两张牌是一张 A 和一张 10 点牌（10、J、Q、K）。
+分牌后的 A+10 不算天然黑杰克。
+"""
+from points21 import Poker, Dealer, hand_value
+from points21_policy import (STAND, HIT, DOUBLE, SPLIT, SURRENDER, Policy,
+                             pair_index, table_index, table_states)
+
+
+class Rules:
+    """一套牌桌规则，默认就是《21 Points.py》本身：没有黑杰克赔率、不分牌、不买保险
+
+    blackjack_pays      天然黑杰克的赔率，如 1.5 即 3:2；None 表示不区分天然黑杰克
+    double              "any" 任意两张牌可加倍，"none" 不能加倍，或允许加倍的点数，如 (9, 10, 11)
+    double_after_split  分牌后能否加倍
+    max_hands           分牌最多分成几手，1 表示不能分牌
+    resplit_aces        A 能否再分
+    hit_split_aces      分开的 A 能否继续要牌，不能时每手只补一张
+    surrender           能否投降（庄家确认没有黑杰克之后）
+    insurance           庄家明牌为 A 时玩家买保险（下注的一半，庄家黑杰克时 2:1）
+    peek                庄家明牌为 A 或 10 时先看暗牌，是黑杰克就直接结算，玩家只输原注
+    """
+
+    def __init__(self, blackjack_pays=None, double="any", double_after_split=True, max_hands=1,
+                 resplit_aces=False, hit_split_aces=False, surrender=True, insurance=False, peek=True):
+        if max_hands < 1:
+            raise ValueError(f"max_hands must be at least 1, got {max_hands}")
+        if isinstance(double, str) and double not in ("any", "none"):
+            raise ValueError(f"double must be 'any', 'none' or a collection of totals, got {double!r}")
+        self.blackjack_pays = blackjack_pays
+        self.double = double if isinstance(double, str) else frozenset(double)
+        self.double_after_split = double_after_split
+        self.max_hands = max_hands
+        self.resplit_aces = resplit_aces
+        self.hit_split_aces = hit_split_aces
+        self.surrender = surrender
+        self.insurance = insurance
+        self.peek = peek
+
+    def __repr__(self):
+        double = self.double if isinstance(self.double, str) else tuple(sorted(self.double))
+        return (f"Rules(blackjack_pays={self.blackjack_pays}, double={double!r}, "
+                f"double_after_split={self.double_after_split}, max_hands={self.max_hands}, "
+                f"resplit_aces={self.resplit_aces}, hit_split_aces={self.hit_split_aces}, "
+                f"surrender={self.surrender}, insurance={self.insurance}, peek={self.peek})")
+
+    def is_basic(self):
+        """只有加倍、投降的限制时，编译后的策略可以直接交给原来的引擎"""
+        return self.blackjack_pays is None and self.max_hands == 1 and not self.insurance
+
+    def can_double(self, total):
+        if self.double == "any":
+            return True
+        if self.double == "none":
+            return False
+        return total in self.double
+
+    def compile(self, policy):
+        """按规则改写 policy 的 first 表：不允许的加倍、投降换成 later 表里的动作"""
+        first = bytearray(policy.first)
+        for total, soft, up in table_states():
+            index = table_index(total, soft, up)
+            action = first[index]
+            if (action == DOUBLE and not self.can_double(total)) or \
+                    (action == SURRENDER and not self.surrender):
+                first[index] = policy.later[index]
+        return Policy(first, policy.later, policy.pairs, policy.name)
+
+    def split_table(self, policy):
+        """分牌后每手头两张牌的动作表：不能投降，不允许时也不能加倍"""
+        first = bytearray(policy.first)
+        for index, action in enumerate(first):
+            if action == SURRENDER or (action == DOUBLE and not self.double_after_split):
+                first[index] = policy.later[index]
+        return bytes(first)
+
+
+# 常见的赌场规则：3:2、任意两张可加倍、分牌后可加倍、最多分成 4 手、A 只能分一次且只补一张、晚投降
+CASINO = Rules(blackjack_pays=1.5, max_hands=4)
+
+
+def is_natural(first, second):
+    """两张牌的点数（A 为 1）是否为一张 A 和一张 10 点牌"""
+    return first + second == 11 and (first == 1 or second == 1)
+
+
+class RuleEngine:
+    """按 Rules 打一手牌的对象引擎
+
+    分牌出来的各手不建 Player 对象，而是放在事先分配好的几列里
+    （hard、aces、stake、total，每列 max_hands 格），一手牌打完再打下一手，
+    所以分多少次牌都不分配新对象。policy 应该已经过 rules.compile()。
+    """
+
+    def __init__(self, rules, policy, draws):
+        self.rules = rules
+        self.policy = policy
+        self.first = policy.first
+        self.split_first = rules.split_table(policy)
+        self.later = policy.later
+        self.pairs = policy.pairs
+        self.draws = draws
+        self.dealer = Dealer("dealer", verbose=False)
+        size = rules.max_hands
+        self.hard = [0] * size
+        self.aces = [0] * size
+        self.stake = [1] * size
+        self.total = [0] * size
+
+    def _play(self, poker, slot, action, up, log=None):
+        """在第 slot 格的手牌上执行头两张牌的 action，然后按 later 表打完"""
+        hard, aces = self.hard, self.aces
+        self.stake[slot] = 2 if action == DOUBLE else 1
+        total = hand_value(hard[slot], aces[slot])
+        if log is not None:
+            log.append(action)
+        if action != STAND:
+            value = min(poker.deal().face, 10)
+            hard[slot] += value
+            aces[slot] += value == 1
+            total = hand_value(hard[slot], aces[slot])
+            while action == HIT and total <= 21 and \
+                    self.later[table_index(total, (total - hard[slot]) // 9, up)]:
+                if log is not None:
+                    log.append(HIT)
+                value = min(poker.deal().face, 10)
+                hard[slot] += value
+                aces[slot] += value == 1
+                total = hand_value(hard[slot], aces[slot])
+            if log is not None and action == HIT and total <= 21:
+                log.append(STAND)
+        self.total[slot] = total
+
+    def _split(self, poker, pair, up, log=None):
+        """把一对 pair 分开并打完每一手，返回手数"""
+        rules = self.rules
+        hard, aces, total = self.hard, self.aces, self.total
+        hard[0] = hard[1] = pair
+        aces[0] = aces[1] = pair == 1
+        n = 2
+        can_resplit = pair != 1 or rules.resplit_aces
+        slot = 0
+        while slot < n:
+            # 每手补第二张牌，又是同样的牌就继续分到空着的格子里
+            value = min(poker.deal().face, 10)
+            while value == pair and can_resplit and n < rules.max_hands and \
+                    self.pairs[pair_index(pair, up)]:
+                hard[n] = pair
+                aces[n] = pair == 1
+                n += 1
+                value = min(poker.deal().face, 10)
+            hard[slot] += value
+            aces[slot] += value == 1
+            if pair == 1 and not rules.hit_split_aces:
+                self.stake[slot] = 1
+                total[slot] = hand_value(hard[slot], aces[slot])
+            else:
+                value = hand_value(hard[slot], aces[slot])
+                action = self.split_first[table_index(value, (value - hard[slot]) // 9, up)]
+                self._play(poker, slot, action, up, log)
+            slot += 1
+        return n
+
+    def play(self, poker, log=None):
+        """用 poker 接下来的牌打一手，返回以下注为单位的输赢（含保险）
+
+        log 是列表时，玩家的决定依次追加进去，记法同 points21_sim.play_hand()，
+        分牌记一个 SPLIT，之后是各手的决定。
+        """
+        rules, dealer = self.rules, self.dealer
+        dealer.clear()
+        first = min(poker.deal().face, 10)
+        second = min(poker.deal().face, 10)
+        hole = poker.deal()
+        up_card = poker.deal()
+        dealer.hit(hole)
+        dealer.hit(up_card)
+        up = min(up_card.face, 10)
+
+        payoff = 0
+        naturals = rules.blackjack_pays is not None
+        dealer_natural = naturals and is_natural(min(hole.face, 10), up)
+        if rules.insurance and up == 1:
+            payoff += 1 if dealer_natural else -0.5
+        player_natural = naturals and is_natural(first, second)
+        if dealer_natural and (rules.peek or player_natural):
+            return payoff if player_natural else payoff - 1
+        if player_natural:
+            return payoff + rules.blackjack_pays
+
+        if first == second and rules.max_hands > 1 and self.pairs[pair_index(first, up)]:
+            if log is not None:
+                log.append(SPLIT)
+            n = self._split(poker, first, up, log)
+        else:
+            hard, aces = first + second, (first == 1) + (second == 1)
+            total = hand_value(hard, aces)
+            action = self.first[table_index(total, (total - hard) // 9, up)]
+            if action == SURRENDER:
+                if log is not None:
+                    log.append(SURRENDER)
+                return payoff - 0.5
+            self.hard[0], self.aces[0] = hard, aces
+            self._play(poker, 0, action, up, log)
+            n = 1
+
+        stake, totals = self.stake, self.total
+        if dealer_natural:
+            # 庄家不先看牌时，到最后才发现是黑杰克，加倍、分牌的注都输掉
+            return payoff - sum(stake[:n])
+        live = False
+        for slot in range(n):
+            if totals[slot] > 21:
+                payoff -= stake[slot]
+            else:
+                live = True
+        if live:
+            draws = self.draws
+            dealer_total = dealer.calc()
+            while draws[dealer_total * 3 + (dealer_total - dealer.hard) // 9]:
+                dealer.hit(poker.deal())
+                dealer_total = dealer.calc()
+            for slot in range(n):
+                total = totals[slot]
+                if total > 21:
+                    continue
+                if dealer_total > 21 or total > dealer_total:
+                    payoff += stake[slot]
+                elif total < dealer_total:
+                    payoff -= stake[slot]
+        return payoff
+
+    def play_deals(self, shoes):
+        """把每一行牌打成一手，返回值同 points21_sim.play_deals()"""
+        poker = Poker()
+        width = shoes.shape[1]
+        buf = shoes.tobytes()
+        counts = [0, 0, 0]
+        net = sumsq = 0
+        for start in range(0, len(buf), width):
+            poker.load(buf[start:start + width])
+            payoff = self.play(poker)
+            counts[(payoff > 0) + 2 * (payoff < 0)] += 1
+            net += payoff
+            sumsq += payoff * payoff
+        return counts + [net, sumsq]
+
+
+if __name__ == "__main__":
+    import time
+
+    from points21_sim import simulate
+    from points21_stats import summarize
+    from points21_strategy import solve
+
+    table = solve()
+    variants = {
+        "21 Points (no extras)": None,
+        "no double, no surrender": Rules(double="none", surrender=False),
+        "3:2 blackjack": Rules(blackjack_pays=1.5),
+        "3:2, split to 4 hands": CASINO,
+        "3:2, split, insurance": Rules(blackjack_pays=1.5, max_hands=4, insurance=True),
+        "6:5, split, no peek": Rules(blackjack_pays=1.2, max_hands=4, peek=False),
+    }
+    for name, rules in variants.items():
+        start = time.perf_counter()
+        result = simulate(300000, table, seed=0, rules=rules)
+        elapsed = time.perf_counter() - start
+        summary = summarize(result)
+        print(f"{name:26} EV {summary['ev']:+.4f} ±{summary['halfwidth']:.4f}  "
+              f"{result['hands'] / elapsed:>9,.0f} hands/s")
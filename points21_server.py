@@ -0,0 +1,261 @@
+"""21 点的 asyncio 会话服务器
+
+《21 Points.py》用 input() 一问一答，一个进程只能陪一个人玩。
+这里用 asyncio 在一个进程里同时服务很多个 TCP 连接，每个连接一个 Session，
+仍然用 Poker / Player / Dealer 发牌记分，规则和交互版一样（庄家不到 17 点就补牌）。
+
+协议按行收发（UTF-8），每条命令只回一行：
+
+    连接后     WELCOME 21 Points: DEAL, HIT, STAND, STATS, QUIT
+    DEAL       TURN 7 K (17) vs * 9
+    HIT        TURN 7 K 3 (20) vs * 9      或爆牌时  LOSE -1 7 K 5 (22) vs 4 9 (13)
+    STAND      WIN +1 7 K (17) vs 4 9 5 (18) 爆牌 ... / LOSE -1 ... / PUSH 0 ...
+    STATS      STATS rounds=3 net=-1
+    QUIT       BYE
+    其他       ERROR ...
+
+    python points21_server.py --port 2121          # 启动服务器，可以用 nc localhost 2121 来玩
+    python points21_server.py --bench 1000         # 本机起 1000 个客户端测延迟
+"""
+import argparse
+import asyncio
+import time
+
+from points21 import Poker, Player, Dealer
+from points21_policy import dealer_draws
+from points21_shuffle import make_rng
+from points21_sim import dealer_play, settle
+
+# 一行命令的最大字节数，超过就断开
+MAX_LINE = 256
+WELCOME = b"WELCOME 21 Points: DEAL, HIT, STAND, STATS, QUIT\n"
+
+
+class Session:
+    """一个连接的游戏状态，只存几个对象和计数"""
+
+    __slots__ = ("poker", "player", "dealer", "draws", "in_round", "rounds", "net")
+
+    def __init__(self, rng, draws):
+        self.poker = Poker(rng)
+        self.player = Player("player", verbose=False)
+        self.dealer = Dealer("dealer", verbose=False)
+        self.draws = draws
+        self.in_round = False
+        self.rounds = 0
+        self.net = 0
+
+    def _show(self, status, reveal=False):
+        player, dealer = self.player, self.dealer
+        cards = " ".join(map(str, player.cards))
+        if reveal:
+            shown = " ".join(map(str, dealer.cards)) + f" ({dealer.calc()})"
+        else:
+            shown = "* " + " ".join(map(str, dealer.cards[1:]))
+        return f"{status} {cards} ({player.calc()}) vs {shown}"
+
+    def _finish(self, payoff):
+        self.in_round = False
+        self.rounds += 1
+        self.net += payoff
+        status = "WIN" if payoff > 0 else "LOSE" if payoff < 0 else "PUSH"
+        return self._show(f"{status} {payoff:+d}" if payoff else f"{status} 0", reveal=True)
+
+    def deal(self):
+        if self.in_round:
+            return "ERROR round in progress, HIT or STAND"
+        # 和交互版一样，每局用一副新洗的牌
+        poker, player, dealer = self.poker, self.player, self.dealer
+        poker.shuffle()
+        player.clear()
+        dealer.clear()
+        player.hit(poker.deal())
+        player.hit(poker.deal())
+        dealer.hit(poker.deal())
+        dealer.hit(poker.deal())
+        self.in_round = True
+        return self._show("TURN")
+
+    def hit(self):
+        if not self.in_round:
+            return "ERROR no round in progress, DEAL first"
+        self.player.hit(self.poker.deal())
+        if self.player.calc() > 21:
+            return self._finish(-1)
+        return self._show("TURN")
+
+    def stand(self):
+        if not self.in_round:
+            return "ERROR no round in progress, DEAL first"
+        dealer_total = dealer_play(self.poker, self.dealer, self.draws)
+        return self._finish(settle(self.player.calc(), dealer_total))
+
+    def stats(self):
+        return f"STATS rounds={self.rounds} net={self.net:+d}"
+
+    def handle(self, line):
+        """处理一行命令，返回要回复的一行（不含换行）"""
+        command = line.strip().upper()
+        if command == "DEAL":
+            return self.deal()
+        if command == "HIT":
+            return self.hit()
+        if command == "STAND":
+            return self.stand()
+        if command == "STATS":
+            return self.stats()
+        if command == "QUIT":
+            return "BYE"
+        return f"ERROR unknown command {command!r}"
+
+
+class SessionProtocol(asyncio.Protocol):
+    """一个连接：按行切分收到的数据交给 Session，回复直接写回
+
+    直接用 Protocol 而不是 StreamReader/StreamWriter，每个连接少一层缓冲和协程，
+    客户端一次发来多行命令时，回复也合并成一次写出。
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.session = None
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.session = Session(self.server.rng, self.server.draws)
+        self.server.active += 1
+        self.server.served += 1
+        transport.write(WELCOME)
+
+    def data_received(self, data):
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b"\n")
+        replies = []
+        for line in lines:
+            # 每一行和最后没收完的半行都要检查长度，不能只看整个缓冲区里有没有换行
+            if len(line) > MAX_LINE:
+                self._refuse(replies)
+                return
+            reply = self.session.handle(line.decode("utf-8", "replace"))
+            replies.append(reply.encode() + b"\n")
+            if reply == "BYE":
+                self.transport.write(b"".join(replies))
+                self.transport.close()
+                return
+        if len(self.buffer) > MAX_LINE:
+            self._refuse(replies)
+            return
+        if replies:
+            self.transport.write(b"".join(replies))
+
+    def _refuse(self, replies):
+        """先写出前面几行的回复，再报错断开"""
+        self.buffer = b""
+        self.transport.write(b"".join(replies) + b"ERROR line too long\n")
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        self.server.active -= 1
+
+    # 对方不读回复时先不读它的命令，免得回复在内存里越堆越多
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+
+class SessionServer:
+    """为每个连接创建一个 Session 的 TCP 服务器
+
+    rng 为所有会话共用的洗牌随机数源，默认是 PCG64（洗牌比 random.Random 快好几倍），
+    dealer_rule 同 simulate()。
+    """
+
+    def __init__(self, rng=None, dealer_rule=17):
+        self.rng = rng or make_rng("pcg64")
+        self.draws = dealer_draws(dealer_rule)
+        self.active = 0
+        self.served = 0
+
+    async def start(self, host="127.0.0.1", port=2121):
+        """开始监听，返回 asyncio.Server；port 为 0 时由系统分配"""
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: SessionProtocol(self), host, port, backlog=4096)
+
+
+async def play_client(host, port, rounds, stand_on=17):
+    """一个简单的客户端：打 rounds 局，不到 stand_on 点就要牌，返回每步的延迟（秒）"""
+    reader, writer = await asyncio.open_connection(host, port)
+    await reader.readline()
+    latencies = []
+
+    async def send(command):
+        start = time.perf_counter()
+        writer.write(command)
+        reply = await reader.readline()
+        latencies.append(time.perf_counter() - start)
+        return reply.decode()
+
+    for _ in range(rounds):
+        reply = await send(b"DEAL\n")
+        while reply.startswith("TURN"):
+            points = int(reply[reply.index("(") + 1:reply.index(")")])
+            reply = await send(b"HIT\n" if points < stand_on else b"STAND\n")
+    await send(b"QUIT\n")
+    writer.close()
+    await writer.wait_closed()
+    return latencies
+
+
+async def bench(n_clients, rounds, seed=None):
+    """在本机起服务器和 n_clients 个客户端，返回 (总步数, 用时, 排好序的延迟)"""
+    server = SessionServer(make_rng("pcg64", seed))
+    listener = await server.start(port=0)
+    port = listener.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play_client("127.0.0.1", port, rounds) for _ in range(n_clients)))
+    elapsed = time.perf_counter() - start
+    listener.close()
+    await listener.wait_closed()
+    latencies = sorted(latency for result in results for latency in result)
+    return len(latencies), elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve 21 Points sessions over a line-based TCP protocol.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2121)
+    parser.add_argument("--seed", type=int, help="seed for reproducible shuffles")
+    parser.add_argument("--dealer-rule", default="17", help="dealer stand total, or S17 / H17")
+    parser.add_argument("--bench", type=int, metavar="CLIENTS",
+                        help="instead of serving, run this many local clients against a local server")
+    parser.add_argument("--rounds", type=int, default=10, help="rounds per client with --bench")
+    args = parser.parse_args()
+
+    if args.bench:
+        moves, elapsed, latencies = asyncio.run(bench(args.bench, args.rounds, args.seed))
+        p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+        print(f"{args.bench} clients, {moves:,} moves in {elapsed:.2f} s ({moves / elapsed:,.0f} moves/s), "
+              f"latency p50 {p50 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms")
+        return
+
+    rule = int(args.dealer_rule) if args.dealer_rule.isdigit() else args.dealer_rule
+
+    async def serve():
+        server = SessionServer(make_rng("pcg64", args.seed), rule)
+        listener = await server.start(args.host, args.port)
+        print(f"Serving 21 Points on {args.host}:{args.port}")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""21 点的无交互批量模拟
+
+复用《21 Points.py》里的 Poker、Player、Dealer，只是关掉打印、
+用策略函数代替 input()，把输赢结果累加成计数。
+"""
+import numpy as np
+
+from points21 import Poker, Player, Dealer
+from points21_array import play_shoes
+from points21_rules import RuleEngine
+from points21_policy import (STAND, HIT, DOUBLE, SURRENDER, HitBelow,
+                             compile_policy, dealer_draws, table_index)
+from points21_shuffle import shuffle_shoes
+
+# 每批生成的牌副数，限制洗牌数组占用的内存
+CHUNK = 1 << 15
+
+
+def card_value(card):
+    """牌面对应的点数，A 记为 1，J/Q/K 记为 10"""
+    return 10 if card.face > 10 else card.face
+
+
+def play_hand(poker, player, dealer, policy, draws, log=None):
+    """不经过 input() 打完一手牌
+
+    发牌顺序与交互版相同：玩家两张、庄家两张（第一张是暗牌）。
+    policy 是编译好的 Policy，draws 是 dealer_draws() 编译的庄家规则，
+    log 是列表时，玩家的每个决定（STAND/HIT 等常量）会依次追加进去。
+    返回以下注为单位的输赢：赢 1、输 -1、平 0，加倍时翻倍，投降为 -0.5。
+    """
+    player.clear()
+    dealer.clear()
+    player.hit(poker.deal())
+    player.hit(poker.deal())
+    dealer.hit(poker.deal())
+    dealer.hit(poker.deal())
+    up = card_value(dealer.cards[1])
+
+    # soft 直接由点数和 hard 算出，省掉再调用一次 calc()
+    total = player.calc()
+    action = policy.first[table_index(total, (total - player.hard) // 9, up)]
+    if log is not None:
+        log.append(action)
+    if action == SURRENDER:
+        return -0.5
+    stake = 2 if action == DOUBLE else 1
+    if action != STAND:
+        player.hit(poker.deal())
+        total = player.calc()
+        # 加倍只要一张；要牌之后每次查 later 表决定是否继续
+        while action == HIT and total <= 21 and \
+                policy.later[table_index(total, (total - player.hard) // 9, up)]:
+            if log is not None:
+                log.append(HIT)
+            player.hit(poker.deal())
+            total = player.calc()
+        if log is not None and action == HIT and total <= 21:
+            log.append(STAND)
+    if total > 21:
+        return -stake
+    return settle(total, dealer_play(poker, dealer, draws), stake)
+
+
+def dealer_play(poker, dealer, draws):
+    """庄家按 draws 补牌，返回庄家的最终点数"""
+    dealer_total = dealer.calc()
+    while draws[dealer_total * 3 + (dealer_total - dealer.hard) // 9]:
+        dealer.hit(poker.deal())
+        dealer_total = dealer.calc()
+    return dealer_total
+
+
+def settle(total, dealer_total, stake=1):
+    """玩家没爆牌时比点数，返回输赢"""
+    if dealer_total > 21 or total > dealer_total:
+        return stake
+    elif total < dealer_total:
+        return -stake
+    else:
+        return 0
+
+
+def split_blocks(n_hands, seed=None):
+    """把 n_hands 按 CHUNK 切成若干块，返回 [(手数, SeedSequence), ...]
+
+    每块从主种子派生出自己独立的随机数流，块的划分只取决于 n_hands，
+    所以不论由几个进程、按什么顺序来算，每块洗出的牌都相同。
+    """
+    sizes = [min(CHUNK, n_hands - start) for start in range(0, n_hands, CHUNK)]
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+def deal_block(n_hands, seed_seq):
+    """用 seed_seq 洗 n_hands 副牌，返回形状为 (n_hands, 52) 的牌面数组"""
+    return shuffle_shoes(np.random.default_rng(seed_seq), n_hands)
+
+
+def play_deals(shoes, policy, draws, engine="object", rules=None):
+    """把每一行牌打成一手，返回 [平局, 玩家赢, 庄家赢, 净输赢, 输赢的平方和]
+
+    rules 是 Rules 且用到了黑杰克赔率、分牌或保险时，对象引擎改用 RuleEngine。
+    """
+    if rules is not None and rules.is_basic():
+        rules = None
+    if engine == "array":
+        return play_shoes(shoes, policy, draws, rules)
+    if rules is not None:
+        return RuleEngine(rules, policy, draws).play_deals(shoes)
+
+    poker = Poker()
+    player = Player("player", verbose=False)
+    dealer = Dealer("dealer", verbose=False)
+    width = shoes.shape[1]
+    buf = shoes.tobytes()
+    counts = [0, 0, 0]
+    net = sumsq = 0
+    for start in range(0, len(buf), width):
+        poker.load(buf[start:start + width])
+        payoff = play_hand(poker, player, dealer, policy, draws)
+        counts[(payoff > 0) + 2 * (payoff < 0)] += 1
+        net += payoff
+        sumsq += payoff * payoff
+    return counts + [net, sumsq]
+
+
+def play_block(n_hands, seed_seq, policy, draws, engine="object", rules=None):
+    """洗出一块牌并打完，返回 [平局, 玩家赢, 庄家赢, 净输赢, 输赢的平方和]"""
+    return play_deals(deal_block(n_hands, seed_seq), policy, draws, engine, rules)
+
+
+def as_result(n_hands, counts):
+    """把 [平局, 玩家赢, 庄家赢, 净输赢, 输赢的平方和] 整理成结果字典
+
+    sumsq 留着是为了算方差，见 points21_stats.RunningStats.from_result()。
+    """
+    return {"hands": n_hands, "win": counts[1], "lose": counts[2], "push": counts[0],
+            "net": counts[3], "sumsq": counts[4]}
+
+
+def _check_engine(engine):
+    if engine not in ("object", "array"):
+        raise ValueError(f"unknown engine: {engine!r}")
+
+
+def simulate(n_hands, player_policy=None, dealer_rule=17, seed=None, engine="object", rules=None):
+    """模拟 n_hands 手牌，每手都用一副重新洗好的牌
+
+    player_policy 可以是 Policy、StrategyTable 或 (total, soft, up) -> 是否要牌 的函数，
+    会先编译成查找表；dealer_rule 是停牌点数或 "S17" / "H17"。
+    engine 为 "object" 时逐手用 Poker/Player/Dealer 对象来打，
+    为 "array" 时交给 points21_array 的向量化引擎；
+    两种引擎从同一个 seed 得到同样的洗牌顺序，结果完全一致。
+    rules 是 points21_rules.Rules，不给时就是《21 Points.py》的规则；
+    数组引擎不支持分牌。
+    返回 {"hands", "win", "lose", "push", "net", "sumsq"}，
+    net 是以下注为单位的净输赢，sumsq 是每手输赢的平方和。
+    """
+    _check_engine(engine)
+    policy = compile_policy(player_policy or HitBelow(17))
+    if rules is not None:
+        policy = rules.compile(policy)
+    draws = dealer_draws(dealer_rule)
+
+    counts = [0, 0, 0, 0, 0]
+    for size, seed_seq in split_blocks(n_hands, seed):
+        block = play_block(size, seed_seq, policy, draws, engine, rules)
+        counts = [a + b for a, b in zip(counts, block)]
+    return as_result(n_hands, counts)
+
+
+def simulate_many(policies, n_hands, dealer_rule=17, seed=None, engine="array", rules=None):
+    """在同样的牌上比较多个策略，返回 {名称: simulate() 的结果}
+
+    policies 是 {名称: 策略}；每块牌只洗一次，所有策略都打这些牌，
+    策略之间的差别不会被洗牌的随机性淹没。
+    """
+    _check_engine(engine)
+    compiled = {name: compile_policy(policy) for name, policy in policies.items()}
+    if rules is not None:
+        compiled = {name: rules.compile(policy) for name, policy in compiled.items()}
+    draws = dealer_draws(dealer_rule)
+
+    totals = {name: [0, 0, 0, 0, 0] for name in compiled}
+    for size, seed_seq in split_blocks(n_hands, seed):
+        shoes = deal_block(size, seed_seq)
+        for name, policy in compiled.items():
+            block = play_deals(shoes, policy, draws, engine, rules)
+            totals[name] = [a + b for a, b in zip(totals[name], block)]
+    return {name: as_result(n_hands, counts) for name, counts in totals.items()}
+
+
+if __name__ == "__main__":
+    import time
+
+    for engine, n_hands in (("object", 100000), ("array", 1000000)):
+        start = time.perf_counter()
+        result = simulate(n_hands, seed=0, engine=engine)
+        elapsed = time.perf_counter() - start
+        print(engine, result)
+        print(f"{result['hands'] / elapsed:,.0f} hands/s")
@@ -0,0 +1,200 @@
+"""21 点模拟结果的统计：方差、置信区间、收敛判断和破产概率
+
+RunningStats 用 Welford 的办法逐个累加输赢，也能直接由计数和平方和构造，
+两个累加器可以合并（Chan 等人的并行公式），各进程各算一块再汇总，结果和单进程一样。
+simulate_until() 一块一块地模拟，期望值的置信区间半宽小于目标就停下。
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from statistics import NormalDist
+
+import numpy as np
+
+from points21_policy import HitBelow, compile_policy, dealer_draws
+from points21_sim import CHUNK, play_block, as_result, _check_engine
+
+
+class RunningStats:
+    """可合并的均值、方差累加器
+
+    n 是样本数，mean 是均值，m2 是离差平方和（方差 = m2 / (n - 1)）。
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def __repr__(self):
+        return f"RunningStats(n={self.n}, mean={self.mean:.6f}, std={self.std:.6f})"
+
+    def add(self, x):
+        """加入一个样本"""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @classmethod
+    def from_sums(cls, n, total, sumsq):
+        """由样本数、总和、平方和构造，用于按块汇总的计数"""
+        if n == 0:
+            return cls()
+        mean = total / n
+        return cls(n, mean, max(0.0, sumsq - total * mean))
+
+    @classmethod
+    def from_result(cls, result):
+        """由 simulate() 等返回的结果字典构造"""
+        return cls.from_sums(result["hands"], result["net"], result["sumsq"])
+
+    def merge(self, other):
+        """把另一个累加器并进来，返回自身"""
+        n = self.n + other.n
+        if n == 0:
+            return self
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def sem(self):
+        """均值的标准误"""
+        return self.std / math.sqrt(self.n) if self.n else float("inf")
+
+    def halfwidth(self, confidence=0.95):
+        """均值的置信区间半宽（正态近似）"""
+        return NormalDist().inv_cdf(0.5 + confidence / 2) * self.sem
+
+    def interval(self, confidence=0.95):
+        """均值的置信区间 (下限, 上限)"""
+        half = self.halfwidth(confidence)
+        return self.mean - half, self.mean + half
+
+    def risk_of_ruin(self, bankroll, hands=None):
+        """本金为 bankroll 个下注单位时输光的概率
+
+        把累计输赢当作漂移为 mean、方差为 variance 的布朗运动：
+        hands 为 None 时是永远打下去的破产概率，期望为正时为 exp(-2·mean·B/var)，否则为 1；
+        给定 hands 时是打 hands 手之内输光的概率。
+        """
+        mean, var = self.mean, self.variance
+        if bankroll <= 0:
+            return 1.0
+        if var == 0:
+            if hands is None:
+                return 0.0 if mean >= 0 else 1.0
+            return float(mean * hands <= -bankroll)
+        if hands is None:
+            return math.exp(-2 * mean * bankroll / var) if mean > 0 else 1.0
+        spread = math.sqrt(var * hands)
+        # exp(exponent) 很大、正态尾概率很小时两者的积并不小，在对数里相加才不会溢出或下溢
+        exponent = -2 * mean * bankroll / var
+        tail = math.exp(exponent + _log_normal_cdf((mean * hands - bankroll) / spread))
+        return min(1.0, NormalDist().cdf((-bankroll - mean * hands) / spread) + tail)
+
+
+def _log_normal_cdf(x):
+    """标准正态分布函数的对数 log Φ(x)，x 很小时 Φ(x) 下溢成 0 也能算"""
+    if x > -30:
+        return math.log(0.5 * math.erfc(-x / math.sqrt(2)))
+    # Φ(x) 的渐近展开 φ(x) / (-x) · (1 - 1/x² + 3/x⁴)
+    return (-x * x / 2 - math.log(-x) - 0.5 * math.log(2 * math.pi)
+            + math.log1p(-1 / x ** 2 + 3 / x ** 4))
+
+
+def summarize(result, confidence=0.95, bankroll=None, hands=None):
+    """把模拟结果整理成 {"hands", "ev", "house_edge", "std", "interval", "halfwidth"}
+
+    给了 bankroll（下注单位）时再加上 "risk_of_ruin"，hands 的含义同 RunningStats.risk_of_ruin()。
+    """
+    stats = RunningStats.from_result(result)
+    summary = {"hands": stats.n, "ev": stats.mean, "house_edge": -stats.mean,
+               "std": stats.std, "interval": stats.interval(confidence),
+               "halfwidth": stats.halfwidth(confidence)}
+    if bankroll is not None:
+        summary["risk_of_ruin"] = stats.risk_of_ruin(bankroll, hands)
+    return summary
+
+
+def simulate_until(halfwidth, player_policy=None, dealer_rule=17, seed=None, engine="array",
+                   confidence=0.95, max_hands=10 ** 9, workers=1, rules=None):
+    """不断模拟，直到期望值的置信区间半宽不超过 halfwidth 或打满 max_hands 手
+
+    每块 CHUNK 手，种子按顺序从主种子派生，停下时的结果
+    与 simulate(同样的手数, seed=seed) 完全相同。
+    workers 大于 1 时每轮把 workers 块交给进程池，停下时可能多打几块。
+    rules 同 simulate()。
+    返回 simulate() 的结果字典，另加 "halfwidth" 一项。
+    """
+    _check_engine(engine)
+    policy = compile_policy(player_policy or HitBelow(17))
+    if rules is not None:
+        policy = rules.compile(policy)
+    draws = dealer_draws(dealer_rule)
+    root = np.random.SeedSequence(seed)
+
+    counts = [0, 0, 0, 0, 0]
+    n_hands = 0
+    stats = RunningStats()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # 至少打两块，免得开头几手碰巧方差很小就停了
+        while n_hands < max_hands and (n_hands < 2 * CHUNK or stats.halfwidth(confidence) > halfwidth):
+            sizes = []
+            while len(sizes) < workers and n_hands + sum(sizes) < max_hands:
+                sizes.append(min(CHUNK, max_hands - n_hands - sum(sizes)))
+            seeds = root.spawn(len(sizes))
+            if pool is None:
+                blocks = map(play_block, sizes, seeds, repeat(policy), repeat(draws),
+                             repeat(engine), repeat(rules))
+            else:
+                blocks = pool.map(play_block, sizes, seeds, repeat(policy), repeat(draws),
+                                  repeat(engine), repeat(rules))
+            for size, block in zip(sizes, blocks):
+                counts = [a + b for a, b in zip(counts, block)]
+                stats.merge(RunningStats.from_sums(size, block[3], block[4]))
+                n_hands += size
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result = as_result(n_hands, counts)
+    result["halfwidth"] = stats.halfwidth(confidence)
+    return result
+
+
+if __name__ == "__main__":
+    import time
+
+    from points21_sim import simulate
+    from points21_strategy import solve
+
+    table = solve()
+    for target in (0.01, 0.003):
+        start = time.perf_counter()
+        result = simulate_until(target, table, seed=0, workers=os.cpu_count() or 1)
+        elapsed = time.perf_counter() - start
+        summary = summarize(result, bankroll=100, hands=10000)
+        low, high = summary["interval"]
+        print(f"±{target}: {result['hands']:,} hands in {elapsed:.2f} s, "
+              f"EV {summary['ev']:+.4f} [{low:+.4f}, {high:+.4f}], std {summary['std']:.3f}, "
+              f"ruin within 10,000 hands (100 units) {summary['risk_of_ruin']:.3f}")
+
+    # 四次模拟的结果合并成一个累加器
+    merged = RunningStats()
+    for seed in range(4):
+        merged.merge(RunningStats.from_result(simulate(50000, table, seed=seed, engine="array")))
+    print(merged)
@@ -0,0 +1,263 @@
+"""21 点的基本策略求解器
+
+按《21 Points.py》的规则（A 记 10 点或 1 点、庄家补牌到 17 点、
+不另算黑杰克赔率）计算每个 (玩家点数, 软牌, 庄家明牌) 状态下
+停牌、要牌、加倍、分牌的精确期望，并给出最优策略表。
+
+期望按不放回抽牌计算（points21_composition 的记忆化引擎）：
+一个状态的期望是组成它的每种两张牌起手的期望、按发到这手牌的概率的平均，
+每种起手都先从牌里去掉这两张牌和庄家明牌，所以单副牌里 8、4 对 4 这样的
+状态与有放回抽牌算出的结果不同。只有三张牌才凑得出的状态（21 点）按三张牌平均。
+单副牌整张表几秒钟算完。
+给了预先算好的 DealerTable 时改用无限副牌近似（有放回抽牌，停牌期望查表），毫秒级。
+状态里的 soft 是正按 10 点算的 A 的张数：A、A 两张都按 10 点算（soft 为 2）
+与只有一张 A 按 10 点的软 20 点，再要牌时结果不同，所以分开存。
+"""
+from itertools import product
+
+from points21 import hand_value
+from points21_policy import Policy, dealer_draws
+
+# 庄家终点分布的下标：17~21 为点数，22 表示爆牌
+BUST = 22
+UP_CARDS = range(1, 11)
+ACTIONS = ("stand", "hit", "double", "split")
+
+
+def shoe_counts(decks=1):
+    """牌靴里点数 1~10（A 为 1，J/Q/K 算 10）各有几张"""
+    return tuple(16 * decks if value == 10 else 4 * decks for value in range(1, 11))
+
+
+def player_states():
+    """策略表覆盖的 (点数, 软牌) 状态：硬牌 4~21、软牌 12~21、两张 A 都算 10 点的 20/21"""
+    states = [(total, 0) for total in range(4, 22)]
+    states += [(total, 1) for total in range(12, 22)]
+    states += [(20, 2), (21, 2)]
+    return states
+
+
+class StrategySolver:
+    """在给定牌的组成（counts，点数 1~10 的张数）下计算各动作的期望
+
+    默认按起手的牌不放回地精确计算；dealer_table 是 points21_dealer 里预先算好的
+    DealerTable 时，表只跟着明牌走，不能跟着剩下的牌变，于是改用有放回抽牌：
+    停牌的期望直接查表，要牌按下面的 hit_ev() 等方法记忆化递归。
+    """
+
+    def __init__(self, counts=None, dealer_rule=17, dealer_table=None):
+        counts = tuple(counts or shoe_counts())
+        size = sum(counts)
+        self.counts = counts
+        self.draws = [(value, count / size)
+                      for value, count in zip(range(1, 11), counts) if count]
+        self.dealer_rule = dealer_rule
+        self.dealer_draws = dealer_draws(dealer_rule)
+        self.dealer_table = dealer_table
+        self._dealer = {}
+        self._hit = {}
+
+    def dealer_finals(self, hard, aces):
+        """庄家从 (hard, aces) 开始补牌，返回终点分布（长 23 的列表，下标即点数）"""
+        # 超过 2 张的 A 不可能再按 10 点算，不影响结果
+        key = (hard, min(aces, 2))
+        if key in self._dealer:
+            return self._dealer[key]
+
+        total = hand_value(hard, aces)
+        dist = [0.0] * (BUST + 1)
+        if total > 21:
+            dist[BUST] = 1.0
+        elif not self.dealer_draws[total * 3 + (total - hard) // 9]:
+            dist[total] = 1.0
+        else:
+            for value, p in self.draws:
+                sub = self.dealer_finals(hard + value, aces + (value == 1))
+                for final, q in enumerate(sub):
+                    if q:
+                        dist[final] += p * q
+        self._dealer[key] = dist
+        return dist
+
+    def stand_ev(self, total, up):
+        """停牌的期望：赢 +1、输 -1、平 0"""
+        if total > 21:
+            return -1.0
+        if self.dealer_table is not None:
+            return self.dealer_table.stand_ev(total, up)
+        dist = self.dealer_finals(up, int(up == 1))
+        win = dist[BUST] + sum(dist[:total])
+        lose = sum(dist[total + 1:BUST])
+        return win - lose
+
+    def hit_ev(self, hard, aces, up):
+        """要一张牌、之后按最优方式继续（要牌或停牌）的期望"""
+        key = (hard, min(aces, 2), up)
+        if key in self._hit:
+            return self._hit[key]
+
+        ev = 0.0
+        for value, p in self.draws:
+            next_hard, next_aces = hard + value, aces + (value == 1)
+            total = hand_value(next_hard, next_aces)
+            if total > 21:
+                ev -= p
+            else:
+                ev += p * max(self.stand_ev(total, up),
+                              self.hit_ev(next_hard, next_aces, up))
+        self._hit[key] = ev
+        return ev
+
+    def double_ev(self, hard, aces, up):
+        """加倍：下注翻倍，只再要一张牌"""
+        return 2 * sum(p * self.stand_ev(hand_value(hard + value, aces + (value == 1)), up)
+                       for value, p in self.draws)
+
+    def split_ev(self, value, up):
+        """把一对 value 分成两手，每手补一张牌后按最优方式打（可加倍，不再分牌）"""
+        ev = 0.0
+        for card, p in self.draws:
+            hard, aces = value + card, (value == 1) + (card == 1)
+            ev += p * max(self.stand_ev(hand_value(hard, aces), up),
+                          self.hit_ev(hard, aces, up),
+                          self.double_ev(hard, aces, up))
+        return 2 * ev
+
+    def action_evs(self, hard, aces, up):
+        """(hard, aces) 这手牌停牌、要牌、加倍的期望"""
+        return {
+            "stand": self.stand_ev(hand_value(hard, aces), up),
+            "hit": self.hit_ev(hard, aces, up),
+            "double": self.double_ev(hard, aces, up),
+        }
+
+    def starting_hands(self, total, soft, up):
+        """组成 (total, soft) 的起手 [(hard, aces, 剩下的牌, 权重)]，权重与发到这手牌的概率成正比
+
+        先找两张牌的起手，没有时找三张牌的；剩下的牌已经去掉了这几张牌和明牌。
+        """
+        from points21_composition import _without
+
+        rest = _without(self.counts, up)
+        for size in (2, 3):
+            hands = {}
+            for cards in product(range(1, 11), repeat=size):
+                hard, aces = sum(cards), cards.count(1)
+                value = hand_value(hard, aces)
+                if value != total or (value - hard) // 9 != soft:
+                    continue
+                # 按顺序一张张发出的概率（去掉分母），同一组牌的各种顺序加在一起
+                weight, left = 1, rest
+                for card in cards:
+                    weight *= left[card - 1]
+                    left = _without(left, card)
+                if weight:
+                    key = tuple(sorted(cards))
+                    hands[key] = (hard, min(aces, 2), left, hands.get(key, (0, 0, 0, 0))[3] + weight)
+            if hands:
+                return list(hands.values())
+        return []
+
+    def exact_evs(self, total, soft, up):
+        """(total, soft) 对 up 时停牌、要牌、加倍的精确期望：各起手按权重平均"""
+        from points21_composition import action_evs
+
+        hands = self.starting_hands(total, soft, up)
+        norm = sum(weight for *_, weight in hands)
+        evs = dict.fromkeys(ACTIONS[:3], 0.0)
+        for hard, aces, left, weight in hands:
+            for action, ev in action_evs(left, hard, aces, up, self.dealer_rule).items():
+                evs[action] += weight / norm * ev
+        return evs
+
+    def exact_pair_evs(self, value, up):
+        """一对 value 对 up 时各动作（含分牌）的精确期望"""
+        from points21_composition import _without, action_evs
+
+        left = _without(_without(_without(self.counts, up), value), value)
+        return action_evs(left, 2 * value, 2 * (value == 1), up, self.dealer_rule, pair=value)
+
+    def solve(self):
+        """算出所有状态的期望，返回 StrategyTable"""
+        if self.dealer_table is None:
+            evs = {(total, soft, up): self.exact_evs(total, soft, up)
+                   for total, soft in player_states() for up in UP_CARDS}
+            pair_evs = {(value, up): self.exact_pair_evs(value, up)
+                        for value in range(1, 11) for up in UP_CARDS}
+            return StrategyTable(evs, pair_evs)
+
+        evs = {}
+        for total, soft in player_states():
+            # 有 soft 张 A 按 10 点算的手牌，等价于 hard = total - 9 * soft、A 有 soft 张
+            hard = total - 9 * soft
+            for up in UP_CARDS:
+                evs[(total, soft, up)] = self.action_evs(hard, soft, up)
+
+        pair_evs = {}
+        for value in range(1, 11):
+            for up in UP_CARDS:
+                pair = self.action_evs(2 * value, 2 * (value == 1), up)
+                pair["split"] = self.split_ev(value, up)
+                pair_evs[(value, up)] = pair
+        return StrategyTable(evs, pair_evs)
+
+
+class StrategyTable:
+    """最优策略表
+
+    evs[(total, soft, up)] 与 pair_evs[(value, up)] 是各动作的期望，
+    policy() 把它编译成模拟引擎用的 Policy。
+    """
+
+    def __init__(self, evs, pair_evs):
+        self.evs = evs
+        self.pair_evs = pair_evs
+        self._policy = None
+
+    def policy(self):
+        """编译成 Policy：头两张牌可加倍，之后只在要牌和停牌里选"""
+        if self._policy is None:
+            first = {state: self.best(*state) for state in self.evs}
+            later = {state: self.best(*state, first_two=False) for state in self.evs}
+            actions = {state: action[0].upper() + later[state][0] for state, action in first.items()}
+            pairs = {key: self.best(None, None, key[1], pair=key[0]) == "split"
+                     for key in self.pair_evs}
+            self._policy = Policy.from_table(actions, pairs, name="basic strategy")
+        return self._policy
+
+    def best(self, total, soft, up, first_two=True, pair=None):
+        """最优动作；不是头两张牌时不能加倍，pair 为对子的点数时可以分牌"""
+        ev = self.pair_evs[(pair, up)] if pair else self.evs[(total, soft, up)]
+        allowed = ACTIONS if pair else ACTIONS[:3] if first_two else ACTIONS[:2]
+        return max(allowed, key=lambda action: ev[action])
+
+    def format(self):
+        """把策略表排成文本：S 停牌、H 要牌、D 加倍、P 分牌"""
+        letters = {"stand": "S", "hit": "H", "double": "D", "split": "P"}
+        ups = list(range(2, 11)) + [1]
+        lines = ["".ljust(12) + " ".join(("A" if up == 1 else str(up)).rjust(2) for up in ups)]
+        for total, soft in player_states():
+            label = ("hard", "soft", "soft A,A")[soft]
+            row = [letters[self.best(total, soft, up)] for up in ups]
+            lines.append(f"{label} {total}".ljust(12) + " ".join(c.rjust(2) for c in row))
+        for value in range(2, 11):
+            row = [letters[self.best(None, None, up, pair=value)] for up in ups]
+            lines.append(f"pair {value}".ljust(12) + " ".join(c.rjust(2) for c in row))
+        row = [letters[self.best(None, None, up, pair=1)] for up in ups]
+        lines.append("pair A".ljust(12) + " ".join(c.rjust(2) for c in row))
+        return "\n".join(lines)
+
+
+def solve(decks=1, dealer_rule=17, dealer_table=None):
+    """求出 decks 副牌、庄家补到 dealer_rule 点时的策略表；给了 dealer_table 时按无限副牌近似"""
+    return StrategySolver(shoe_counts(decks), dealer_rule, dealer_table).solve()
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    table = solve()
+    elapsed = time.perf_counter() - start
+    print(table.format())
+    print(f"\nSolved in {elapsed:.1f} s")
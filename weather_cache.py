@@ -0,0 +1,181 @@
+"""城市页面解析结果的两级缓存：内存 LRU + 磁盘
+
+按页面的 URL 保存解析好的预报和下载时间，ttl 秒之内再查同一个页面直接返回，不发请求；
+URL 里含有站点地址和城市编号，对着本机替身站点（--base-url）查到的结果不会被当成真站点的。
+过期后带上上次的 ETag / Last-Modified 重新验证，服务器回 304 时只刷新下载时间，
+不下载也不解析页面。
+
+内存里最多保留 max_entries 个页面，最久没用的先淘汰；
+磁盘上每个页面一个 JSON 文件（城市编号加站点地址的哈希），程序重启后仍然有效，读到时再放回内存。
+这个模块只管存取，请求和验证的流程在《天气预报.py》的 fetch_forecast(cache=...) 里。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from weather_parse import forecast_from_json
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "weather", "forecasts")
+# CMA 的预报一天只更新几次，10 分钟内不必重新请求
+DEFAULT_TTL = 600
+
+
+class ForecastCache:
+    """按页面 URL 缓存 {"code", "url", "fetched", "etag", "last_modified", "forecast"}
+
+    path 为 None 时只用内存。返回的 forecast 是缓存里的同一个对象，不要修改它。
+    多个线程可以共用一个 ForecastCache。
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_entries=128):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "revalidated": 0, "miss": 0}
+
+    def _file(self, url):
+        # 文件名如 "54511-3f2a9c1e.json"：城市编号便于查看，哈希区分不同的站点
+        prefix, _, page = url.rpartition("/")
+        code = page.removesuffix(".html")
+        return os.path.join(self.path, f"{code}-{hashlib.md5(prefix.encode()).hexdigest()[:8]}.json")
+
+    def _count(self, kind):
+        with self.lock:
+            self.hits[kind] += 1
+
+    def _remember(self, entry):
+        with self.lock:
+            self.memory[entry["url"]] = entry
+            self.memory.move_to_end(entry["url"])
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+
+    def entry(self, url):
+        """返回 (entry, 来源)，来源为 "memory" 或 "disk"；都没有时返回 (None, None)"""
+        with self.lock:
+            entry = self.memory.get(url)
+            if entry is not None:
+                self.memory.move_to_end(url)
+                return entry, "memory"
+        if self.path is None:
+            return None, None
+        try:
+            with open(self._file(url), encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["forecast"] = forecast_from_json(entry["forecast"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+        if entry.get("url") != url:
+            return None, None
+        self._remember(entry)
+        return entry, "disk"
+
+    def fresh(self, entry):
+        return entry is not None and time.time() - entry["fetched"] < self.ttl
+
+    def lookup(self, url):
+        """没过期的缓存：返回 (entry, 来源)，否则 (None, None)"""
+        entry, source = self.entry(url)
+        if self.fresh(entry):
+            self._count(source)
+            return entry, source
+        return None, None
+
+    def validators(self, url):
+        """重新验证用的请求头，没有缓存或缓存里没有 ETag / Last-Modified 时为空"""
+        entry, _ = self.entry(url)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, code, url, forecast, etag=None, last_modified=None):
+        entry = {"code": code, "url": url, "fetched": time.time(),
+                 "etag": etag, "last_modified": last_modified, "forecast": forecast}
+        self._count("miss")
+        self._remember(entry)
+        self._write(entry)
+        return entry
+
+    def revalidated(self, url):
+        """服务器回了 304：刷新下载时间，返回缓存的 entry（已被清除时为 None）"""
+        entry, _ = self.entry(url)
+        if entry is None:
+            return None
+        entry = dict(entry, fetched=time.time())
+        self._count("revalidated")
+        self._remember(entry)
+        self._write(entry)
+        return entry
+
+    def _write(self, entry):
+        if self.path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        # 先写临时文件再改名，读到的总是完整的文件；文件名带线程号，几个线程同时写也不冲突
+        path = self._file(entry["url"])
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp, path)
+
+    def clear(self):
+        """清空内存和磁盘上的缓存"""
+        with self.lock:
+            self.memory.clear()
+        if self.path is not None and os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.path, name))
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from weather_stub import StubServer, sample_page
+    from 天气预报 import CITY_CODE_MAP, fetch_all, fetch_forecast, make_session
+
+    code = CITY_CODE_MAP["北京"]
+    with StubServer(delay=0.05) as stub, tempfile.TemporaryDirectory() as path:
+        session = make_session()
+
+        def show(label, cache):
+            result = fetch_forecast(code, session, base_url=stub.base_url, cache=cache)
+            print(f"{label:28} {result['source']:12} {result['elapsed'] * 1e6:>10.1f} us")
+
+        cache = ForecastCache(path)
+        show("first query", cache)
+        show("same city again", cache)
+        show("new process, same disk", ForecastCache(path))
+        cache.ttl = 0
+        show("expired, page unchanged", cache)
+        stub.set_pages(dict(stub.pages, **{code: sample_page(code, today=False).encode()}))
+        show("expired, page changed", cache)
+
+        n = 100000
+        cache.ttl = DEFAULT_TTL
+        start = time.perf_counter()
+        for _ in range(n):
+            fetch_forecast(code, base_url=stub.base_url, cache=cache)
+        print(f"memory hit: {(time.perf_counter() - start) / n * 1e6:.2f} us per query")
+
+        cache.clear()
+        start = time.perf_counter()
+        fetch_all(session=session, base_url=stub.base_url, cache=cache)
+        print(f"\nall cities, cold cache:  {time.perf_counter() - start:.3f} s")
+        start = time.perf_counter()
+        fetch_all(session=session, base_url=stub.base_url, cache=cache)
+        print(f"all cities, warm cache:  {time.perf_counter() - start:.3f} s")
+        cache.ttl = 0
+        start = time.perf_counter()
+        fetch_all(session=session, base_url=stub.base_url, cache=cache)
+        print(f"all cities, revalidated: {time.perf_counter() - start:.3f} s")
+        print(cache.hits, f"{stub.not_modified} responses were 304")
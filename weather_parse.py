@@ -0,0 +1,180 @@
+"""只取预报块的快速解析
+
+《天气预报.py》原来把整页交给 BeautifulSoup(content, "lxml") 建一棵完整的树，
+再用 find / find_all 找 class 为 "pull-left day actived" 和 "pull-left day" 的 div。
+页面上大部分是导航、逐小时表格和脚本，预报块只占一小段。
+
+parse_forecast() 只用几个预先编译的正则：
+先找到每个预报块的开始标签，按 <div> / </div> 的层数找到它的结束位置，
+只在这一段里去掉标签取日期，再找 class 为 high、low 的 div。
+匹配规则与 BeautifulSoup 的写法一致（class 属性整个相等、取元素的全部文字、去掉所有空白），
+parse_forecast_soup() 保留了原来的写法，用来核对。
+"""
+import re
+from collections import namedtuple
+from html import unescape
+
+# BeautifulSoup 按空白拆开 class 再用一个空格连起来比较，所以多余的空白也算相等
+DAY_START = re.compile(r"""<div\b[^>]*?\sclass=(["'])\s*pull-left\s+day(\s+actived)?\s*\1[^>]*>""")
+HIGH_START = re.compile(r"""<div\b[^>]*?\sclass=(["'])\s*high\s*\1[^>]*>""")
+LOW_START = re.compile(r"""<div\b[^>]*?\sclass=(["'])\s*low\s*\1[^>]*>""")
+# 注释、脚本、样式里的文字在 BeautifulSoup 的 .text 里也不算，先整段去掉
+IGNORED = re.compile(r"<!--.*?-->|<script\b.*?</script>|<style\b.*?</style>", re.S | re.I)
+TAG = re.compile(r"<[^>]*>")
+DATE = re.compile(r"[0-9]{2}/[0-9]{2}")
+SPACE = re.compile(r"\s+")
+DEGREES = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class DayForecast(namedtuple("DayForecast", "date high low")):
+    """一天的预报：date 如 "10/18"，high、low 如 "18℃"，页面上没有的项为 None"""
+
+    __slots__ = ()
+
+    @property
+    def high_c(self):
+        """最高温度（摄氏度，float），没有或不是数字时为 None"""
+        return degrees(self.high)
+
+    @property
+    def low_c(self):
+        return degrees(self.low)
+
+
+def degrees(text):
+    """"18℃" -> 18.0；None 或没有数字时为 None"""
+    match = DEGREES.search(text) if text else None
+    return float(match.group()) if match else None
+
+
+def _element_end(html, start):
+    """从一个 <div> 开始标签之后的 start 起，找到与它配对的 </div> 之后的位置
+
+    只数 "<div" 和 "</div>"，比逐个匹配标签快得多；页面里的标签都是小写的。
+    """
+    depth = 1
+    while True:
+        close = html.find("</div>", start)
+        if close < 0:
+            return len(html)
+        depth += html.count("<div", start, close) - 1
+        start = close + len("</div>")
+        if depth == 0:
+            return start
+
+
+def _text(fragment):
+    """元素里的全部文字，同 BeautifulSoup 的 .text"""
+    if "<" in fragment:
+        fragment = TAG.sub("", IGNORED.sub("", fragment))
+    return unescape(fragment) if "&" in fragment else fragment
+
+
+def _inner(html, pattern, start, end):
+    """[start, end) 里第一个匹配 pattern 的 div 去掉空白后的文字，没有时为 None"""
+    match = pattern.search(html, start, end)
+    if match is None:
+        return None
+    close = _element_end(html, match.end())
+    return SPACE.sub("", _text(html[match.end():close - len("</div>")]))
+
+
+def parse_forecast(content):
+    """解析城市页面（bytes 或 str），返回 {"today": DayForecast 或 None, "future": [DayForecast]}
+
+    today 是第一个 "pull-left day actived" 块，future 是所有 "pull-left day" 块。
+    """
+    html = content.decode("utf-8", "replace") if isinstance(content, bytes) else content
+    today = None
+    future = []
+    pos = 0
+    while True:
+        match = DAY_START.search(html, pos)
+        if match is None:
+            break
+        end = _element_end(html, match.end())
+        actived = match.group(2) is not None
+        if not actived or today is None:
+            date = DATE.search(_text(html[match.end():end]))
+            day = DayForecast(date.group() if date else None,
+                              _inner(html, HIGH_START, match.end(), end),
+                              _inner(html, LOW_START, match.end(), end))
+            if actived:
+                today = day
+            else:
+                future.append(day)
+        # 预报块不会嵌套，直接从块的结尾继续找
+        pos = end
+    return {"today": today, "future": future}
+
+
+def parse_forecast_soup(content):
+    """原来的 BeautifulSoup 写法，结果的格式同 parse_forecast()，用来核对"""
+    from bs4 import BeautifulSoup
+
+    def parse_day(item):
+        date_match = re.findall(r"[0-9]{2}/[0-9]{2}", item.text)
+        high_temp = item.find('div', {'class': 'high'})
+        low_temp = item.find('div', {'class': 'low'})
+        return DayForecast(date_match[0] if date_match else None,
+                           re.sub(r'\s+', '', high_temp.text) if high_temp else None,
+                           re.sub(r'\s+', '', low_temp.text) if low_temp else None)
+
+    soup = BeautifulSoup(content, "lxml")
+    weather_today = soup.find("div", {"class": "pull-left day actived"})
+    weather_future = soup.find_all("div", {"class": "pull-left day"})
+    return {"today": parse_day(weather_today) if weather_today else None,
+            "future": [parse_day(item) for item in weather_future]}
+
+
+def forecast_from_json(data):
+    """json.loads 之后 DayForecast 变成了列表，换回 DayForecast"""
+    today = data.get("today")
+    return {"today": DayForecast(*today) if today else None,
+            "future": [DayForecast(*day) for day in data.get("future", ())]}
+
+
+def fixtures():
+    """核对用的页面 {名称: bytes}：各城市的整页，加上几种结构上的特殊情况"""
+    from datetime import date
+
+    from weather_stub import sample_days, sample_page
+    from 天气预报 import CITY_CODE_MAP
+
+    # 固定起始日期，每次生成的页面完全一样
+    start = date(2024, 12, 28)
+    pages = {f"city-{code}": sample_page(code, start=start).encode() for code in CITY_CODE_MAP.values()}
+    pages["no-today"] = sample_page("54511", today=False, start=start).encode()
+    pages["one-day"] = sample_page("54511", days=sample_days("54511", 1, start), start=start).encode()
+    pages["no-days"] = b"<html><body><div class='row'>no forecast</div></body></html>"
+    pages["edge-cases"] = """<html><body>
+        <div id="d0" class="pull-left day actived" data-x="1"><div class="day-item">
+          <!-- 01/01 --> 星期三<br/>12/31 &amp; 01/02</div>
+          <div class="bar"><div class='high'>  3<span>&nbsp;℃</span> </div></div>
+        </div>
+        <div class='pull-left day'><div class="day-item">01/01</div>
+          <div class="high"><div class="inner">5</div>℃</div></div>
+        <div class="pull-left day actived"><div>01/02</div><div class="high">9℃</div></div>
+        <div class="pull-left  day"><div>01/03</div><div class="high">7℃</div></div>
+        <div class="pull-left day"><script>var d = "01/04";</script><div class="low">-2℃</div></div>
+        <div class="pull-left day other"><div>01/05</div></div>
+        </body></html>""".encode()
+    return pages
+
+
+if __name__ == "__main__":
+    import timeit
+
+    pages = fixtures()
+    mismatches = [name for name, page in pages.items() if parse_forecast(page) != parse_forecast_soup(page)]
+    print(f"{len(pages) - len(mismatches)}/{len(pages)} fixtures agree with BeautifulSoup"
+          + (f", mismatched: {mismatches}" if mismatches else ""))
+    print("edge cases:", parse_forecast(pages["edge-cases"]))
+
+    page = pages["city-54511"]
+    for name, parse in (("BeautifulSoup", parse_forecast_soup), ("regex", parse_forecast)):
+        n, total = timeit.Timer(lambda: parse(page)).autorange()
+        print(f"{name:14} {total / n * 1000:8.3f} ms per page ({len(page):,} bytes)")
+    soup_time = min(timeit.repeat(lambda: parse_forecast_soup(page), number=20, repeat=3)) / 20
+    fast_time = min(timeit.repeat(lambda: parse_forecast(page), number=2000, repeat=3)) / 2000
+    print(f"speedup: {soup_time / fast_time:.0f}x")
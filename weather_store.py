@@ -0,0 +1,194 @@
+"""预报的历史记录：只追加的 SQLite 表
+
+每次查到的预报按天拆成一行 (station, target_date, fetched, high, low)：
+fetched 为下载时间（Unix 秒），station 为城市编号，target_date 为预报的那一天（"2024-12-31"），
+high、low 为摄氏度，页面上没有时为 NULL。同一个站点、同一天的预报会被查很多次，
+把它们按 fetched 排起来就能看出预报是怎么一步步变化的。
+
+表以 (station, target_date, fetched) 为主键并且 WITHOUT ROWID，
+行在磁盘上就按这个顺序存放，按站点和日期范围查询只读连续的一段。
+同一时刻的同一条预报重复写入时忽略，所以从缓存取出的结果再记一遍也不会重复。
+
+    store = ForecastStore()
+    store.record(fetch_all(cache=cache))
+    store.history("54511", "2024-12-31")
+"""
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "weather", "history.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    station TEXT NOT NULL,
+    target_date TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    high REAL,
+    low REAL,
+    PRIMARY KEY (station, target_date, fetched)
+) WITHOUT ROWID
+"""
+
+
+def target_date(mmdd, fetched):
+    """页面上的 "MM/DD" 没有年份，取离下载时间最近的那一年，返回 "YYYY-MM-DD"；无法解析时为 None"""
+    try:
+        month, day = map(int, mmdd.split("/"))
+    except (AttributeError, ValueError):
+        return None
+    today = datetime.fromtimestamp(fetched).date()
+    best = None
+    for year in (today.year - 1, today.year, today.year + 1):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            continue
+        if best is None or abs(candidate - today) < abs(best - today):
+            best = candidate
+    return best.isoformat() if best else None
+
+
+def forecast_rows(station, forecast, fetched):
+    """一个城市的 forecast（parse_forecast() 的结果）-> 行的列表，没有日期的天跳过"""
+    days = ([forecast["today"]] if forecast["today"] else []) + list(forecast["future"])
+    rows = []
+    for day in days:
+        target = target_date(day.date, fetched)
+        if target is not None:
+            rows.append((station, target, fetched, day.high_c, day.low_c))
+    return rows
+
+
+class ForecastStore:
+    """存在一个 SQLite 文件里的预报记录，只能追加和查询"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        # WAL 模式下写入时也能读，批量写入只在提交时同步一次
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def insert(self, rows, batch=50000):
+        """写入 (station, target_date, fetched, high, low) 行，每 batch 行一个事务；返回新增的行数"""
+        added = 0
+        rows = iter(rows)
+        while True:
+            chunk = [row for _, row in zip(range(batch), rows)]
+            if not chunk:
+                return added
+            with self.db:
+                before = self.db.total_changes
+                self.db.executemany("INSERT OR IGNORE INTO forecasts VALUES (?, ?, ?, ?, ?)", chunk)
+                added += self.db.total_changes - before
+
+    def record(self, results, fetched=None):
+        """写入 fetch_all() 的结果 {城市名: 结果}（或 fetch_forecast() 结果的列表），跳过失败的
+
+        fetched 默认取每个结果自己的下载时间。
+        """
+        results = results.values() if isinstance(results, dict) else results
+        rows = []
+        for result in results:
+            if result["ok"]:
+                rows.extend(forecast_rows(result["code"], result["forecast"], fetched or result["fetched"]))
+        return self.insert(rows)
+
+    def query(self, station, start=None, end=None, since=None, until=None):
+        """某个站点 target_date 在 [start, end] 之内、下载时间在 [since, until] 之内的行
+
+        日期为 "YYYY-MM-DD" 或 date，时间为 Unix 秒，不给就不限；
+        返回 (target_date, fetched, high, low) 的列表，按 target_date、fetched 排序。
+        """
+        sql = "SELECT target_date, fetched, high, low FROM forecasts WHERE station = ?"
+        params = [station]
+        for column, op, value in (("target_date", ">=", start), ("target_date", "<=", end),
+                                  ("fetched", ">=", since), ("fetched", "<=", until)):
+            if value is not None:
+                sql += f" AND {column} {op} ?"
+                params.append(str(value) if isinstance(value, date) else value)
+        return self.db.execute(sql + " ORDER BY target_date, fetched", params).fetchall()
+
+    def history(self, station, day):
+        """同一站点、同一天的所有预报 [(fetched, high, low)]，按下载时间排序，可以看出预报的变化"""
+        day = str(day)
+        return [row[1:] for row in self.query(station, day, day)]
+
+    def latest(self, station, start=None, end=None):
+        """每个 target_date 最后一次的预报 [(target_date, fetched, high, low)]"""
+        sql = ("SELECT target_date, MAX(fetched), high, low FROM forecasts WHERE station = ?"
+               " AND target_date >= ? AND target_date <= ? GROUP BY target_date ORDER BY target_date")
+        return self.db.execute(sql, (station, str(start or "0000-00-00"), str(end or "9999-99-99"))).fetchall()
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from datetime import timedelta
+
+    from 天气预报 import CITY_CODE_MAP
+
+    # 一年里每小时给每个城市记一次 7 天的预报，越临近的预报越准
+    path = os.path.join(tempfile.gettempdir(), "weather_history_demo.sqlite3")
+    for name in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(name):
+            os.remove(name)
+
+    def snapshots(days):
+        rng = random.Random(0)
+        first = datetime(2024, 1, 1)
+        for offset in range(days):
+            today = (first + timedelta(offset)).date()
+            targets = [(today + timedelta(ahead)) for ahead in range(7)]
+            names = [target.isoformat() for target in targets]
+            for hour in range(24):
+                fetched = (first + timedelta(offset, hours=hour)).timestamp()
+                for code in CITY_CODE_MAP.values():
+                    for ahead, target in enumerate(targets):
+                        actual = 15 + 3 * ((target.toordinal() * 7 + int(code)) % 11 - 5)
+                        high = round(actual + rng.gauss(0, 0.5 + ahead))
+                        yield code, names[ahead], fetched, high, high - 8
+
+    with ForecastStore(path) as store:
+        start = time.perf_counter()
+        added = store.insert(snapshots(366))
+        elapsed = time.perf_counter() - start
+        print(f"inserted {added:,} rows in {elapsed:.1f} s ({added / elapsed:,.0f} rows/s), "
+              f"{os.path.getsize(path) / 2 ** 20:.0f} MiB")
+
+        code = CITY_CODE_MAP["北京"]
+        for label, call in (("one day, all snapshots", lambda: store.history(code, "2024-07-01")),
+                            ("one month, all snapshots", lambda: store.query(code, "2024-07-01", "2024-07-31")),
+                            ("one year, latest per day", lambda: store.latest(code, "2024-01-01", "2024-12-31"))):
+            call()
+            start = time.perf_counter()
+            rows = call()
+            print(f"{label:26} {len(rows):>6,} rows in {(time.perf_counter() - start) * 1000:6.2f} ms")
+
+        history = store.history(code, "2024-07-01")
+        print("\n2024-07-01 forecast for 北京, by days ahead:")
+        for fetched, high, low in history[::24]:
+            ahead = (date(2024, 7, 1) - datetime.fromtimestamp(fetched).date()).days
+            print(f"  {ahead} days ahead: high {high:.0f}, low {low:.0f}")
+    for name in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(name):
+            os.remove(name)
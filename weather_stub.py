@@ -0,0 +1,267 @@
+"""本机的 weather.cma.cn 替身，用来在没有网络时测试和计时《天气预报.py》
+
+sample_page() 按 weather.cma.cn 城市页面的结构生成一页 HTML：
+导航、7 天预报块（今天的 class 为 "pull-left day actived"）、逐小时表格和脚本，
+温度由城市编号决定，同一个编号每次生成的页面都一样。
+
+StubServer 在后台线程里提供 /web/weather/{编号}.html，支持 keep-alive，
+每个请求可以先等待 delay 秒模拟网络延迟，并记录收到的请求数和连接数；
+不认识的编号会被重定向到首页，和真站点一样；
+支持 ETag / Last-Modified 的条件请求。
+
+    with StubServer(delay=0.2) as stub:
+        fetch_all(base_url=stub.base_url)
+"""
+import hashlib
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from 天气预报 import CITY_CODE_MAP
+
+WEEKDAYS = ("星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日")
+SKIES = ("晴", "多云", "阴", "小雨", "阵雨", "雷阵雨", "小雪")
+WINDS = ("无持续风向", "东北风", "东风", "东南风", "南风", "西南风", "西风", "西北风", "北风")
+
+
+def sample_days(city_code, days=7, start=None):
+    """城市 city_code 从 start 起 days 天的 (日期, 最高, 最低)，日期为 date 对象"""
+    rng = random.Random(city_code)
+    start = start or date.today()
+    result = []
+    for i in range(days):
+        high = rng.randint(-10, 36)
+        result.append((start + timedelta(i), high, high - rng.randint(3, 12)))
+    return result
+
+
+def _day_block(day, high, low, actived, rng):
+    sky, wind = rng.choice(SKIES), rng.choice(WINDS)
+    return f"""
+        <div class="pull-left day{' actived' if actived else ''}">
+          <div class="day-item">
+            {WEEKDAYS[day.weekday()]}<br>
+            {day:%m/%d}
+          </div>
+          <div class="day-item dayicon"><img src="/static/img/w/icon/w{rng.randint(0, 30)}.png"></div>
+          <div class="day-item">{sky}</div>
+          <div class="day-item">{wind}</div>
+          <div class="day-item">{rng.choice(("微风", "3~4级", "4~5级"))}</div>
+          <div class="day-item bardiv">
+            <div class="bar" style="height: 60px; top: {rng.randint(0, 40)}px;">
+              <div class="high">
+                {high}℃
+              </div>
+              <div class="low">
+                {low}℃
+              </div>
+            </div>
+          </div>
+          <div class="day-item nighticon"><img src="/static/img/w/icon/w{rng.randint(0, 30)}.png"></div>
+          <div class="day-item">{sky}</div>
+          <div class="day-item">{wind}</div>
+          <div class="day-item">微风</div>
+        </div>"""
+
+
+def _hour_table(index, rng):
+    hours = [f"{hour:02d}:00" for hour in range(2, 24, 3)]
+    rows = [("时间", hours)]
+    for label, make in (("天气", lambda: f'<img src="/static/img/w/icon/w{rng.randint(0, 30)}.png">'),
+                        ("气温", lambda: f"{rng.uniform(-10, 36):.1f}℃"),
+                        ("降水", lambda: "无降水" if rng.random() < 0.7 else f"{rng.uniform(0, 9):.1f}mm"),
+                        ("风速", lambda: f"{rng.uniform(0, 9):.1f}m/s"),
+                        ("风向", lambda: rng.choice(WINDS)),
+                        ("气压", lambda: f"{rng.uniform(990, 1030):.1f}hPa"),
+                        ("湿度", lambda: f"{rng.uniform(10, 100):.1f}%"),
+                        ("云量", lambda: f"{rng.uniform(0, 100):.1f}%")):
+        rows.append((label, [make() for _ in hours]))
+    body = "\n".join(
+        "<tr><td>" + label + "</td>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>"
+        for label, cells in rows)
+    hidden = "" if index == 0 else ' style="display:none"'
+    return f'<table class="hour-table" id="hourTable_{index}"{hidden}>\n<tbody>\n{body}\n</tbody>\n</table>'
+
+
+def sample_page(city_code, days=None, today=True, start=None):
+    """生成城市 city_code 的页面 HTML（str）
+
+    days 为 sample_days() 的结果，默认 7 天；today 为 False 时没有 actived 的那一块。
+    """
+    days = sample_days(city_code, start=start) if days is None else days
+    rng = random.Random(f"page-{city_code}")
+    blocks = "".join(_day_block(day, high, low, today and i == 0, rng)
+                     for i, (day, high, low) in enumerate(days))
+    nav = "\n".join(f'<li><a href="/web/weather/{code}.html">{name}</a></li>'
+                    for name, code in CITY_CODE_MAP.items())
+    hours = "\n".join(_hour_table(i, rng) for i in range(len(days)))
+    script = "\n".join(f"var chartData{i} = [{', '.join(f'{rng.uniform(-10, 36):.1f}' for _ in range(48))}];"
+                       for i in range(len(days)))
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+  <meta charset="UTF-8">
+  <title>{city_code} - 天气预报 - 中国气象局</title>
+  <link rel="stylesheet" href="/static/css/bootstrap.min.css">
+  <link rel="stylesheet" href="/static/css/main.css">
+</head>
+<body>
+  <nav class="navbar"><ul class="nav navbar-nav">
+{nav}
+  </ul></nav>
+  <div class="container">
+    <div class="row hp">
+      <div class="hd">7天天气预报（{days[0][0]:%Y/%m/%d} 08:00发布）</div>
+      <div id="dayList">{blocks}
+      </div>
+    </div>
+    <div class="row hp">
+{hours}
+    </div>
+  </div>
+  <script>
+{script}
+  </script>
+  <footer>中国气象局 版权所有</footer>
+</body>
+</html>
+"""
+
+
+HOME_PAGE = "<html><body>中国气象局</body></html>".encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        stub = self.server
+        with stub.lock:
+            stub.requests += 1
+        if stub.delay:
+            time.sleep(stub.delay(self.path) if callable(stub.delay) else stub.delay)
+        code = self.path.rsplit("/", 1)[-1].removesuffix(".html")
+        if self.path == "/web/":
+            self._send(200, HOME_PAGE)
+            return
+        if not self.path.startswith("/web/weather/") or code not in stub.pages:
+            self.send_response(302)
+            self.send_header("Location", "/web/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = stub.etags[code]
+        # 有 If-None-Match 时只比较 ETag，没有时才看 If-Modified-Since
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match == etag or \
+                (if_none_match is None and self.headers.get("If-Modified-Since") == stub.last_modified):
+            with stub.lock:
+                stub.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._send(200, stub.pages[code], {"ETag": etag, "Last-Modified": stub.last_modified})
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """在后台线程里运行的替身站点
+
+    pages 为 {编号: 页面 bytes}，默认为 CITY_CODE_MAP 里每个城市的 sample_page()；
+    delay 为每个请求的等待秒数，也可以是 path -> 秒数 的函数。
+    页面带 ETag（内容的哈希）和 Last-Modified（页面设置的时间），
+    请求带上相同的 If-None-Match 或 If-Modified-Since 时回 304；
+    换页面内容用 set_pages()。
+    """
+
+    daemon_threads = True
+    # 并发请求多时不要因为 listen 队列满而拒绝连接
+    request_queue_size = 128
+
+    def __init__(self, delay=0.0, pages=None, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.not_modified = 0
+        self.thread = None
+        self.set_pages(pages if pages is not None else {
+            code: sample_page(code).encode() for code in CITY_CODE_MAP.values()})
+
+    def set_pages(self, pages):
+        self.pages = pages
+        self.etags = {code: f'"{hashlib.md5(body).hexdigest()}"' for code, body in pages.items()}
+        self.last_modified = formatdate(usegmt=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/web/weather/"
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # 客户端超时后先断开连接是正常的，不打印
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+if __name__ == "__main__":
+    from 天气预报 import fetch_all, fetch_forecast, make_session
+
+    # 每个请求 50~300 ms，最慢的是北京
+    slowest = CITY_CODE_MAP["北京"]
+    with StubServer(delay=lambda path: 0.3 if slowest in path else 0.05 + sum(path.encode()) % 200 / 1000) as stub:
+        start = time.perf_counter()
+        for code in CITY_CODE_MAP.values():
+            fetch_forecast(code, base_url=stub.base_url)
+        serial = time.perf_counter() - start
+        print(f"one at a time, no Session: {serial:.2f} s, {stub.connections} connections")
+
+        stub.connections = 0
+        start = time.perf_counter()
+        results = fetch_all(base_url=stub.base_url)
+        elapsed = time.perf_counter() - start
+        print(f"fetch_all:                 {elapsed:.2f} s, {stub.connections} connections, "
+              f"slowest request {max(r['elapsed'] for r in results.values()):.2f} s")
+
+        # 同一个 Session 再刷新一次，连接都还在池里
+        session = make_session()
+        fetch_all(session=session, base_url=stub.base_url)
+        stub.connections = 0
+        start = time.perf_counter()
+        results = fetch_all(session=session, base_url=stub.base_url)
+        print(f"refresh on a warm Session: {time.perf_counter() - start:.2f} s, {stub.connections} new connections")
+        print(f"{sum(r['ok'] for r in results.values())}/{len(results)} ok, 北京 today:",
+              results["北京"]["forecast"]["today"])
+
+        print("unknown code:", fetch_forecast("00000", base_url=stub.base_url)["error"])
+        print("timeout:", fetch_forecast(slowest, timeout=0.1, base_url=stub.base_url)["error"])
@@ -1,6 +1,21 @@
-import re
-from bs4 import BeautifulSoup
-import requests
+"""中国气象局 weather.cma.cn 的城市天气预报
+
+可以直接运行，也可以 import 天气预报 后调用其中的函数：
+    fetch_forecast / fetch_all   下载（可带缓存）并解析
+    parse_forecast               解析页面（见 weather_parse）
+    format_forecast / FORMATS    把结果排成文字、JSON 或 CSV
+
+    python 天气预报.py                          # 交互式查询
+    python 天气预报.py 北京 58362               # 按城市名或编号查询
+    python 天气预报.py all --format json       # 所有城市，输出 JSON
+    python 天气预报.py 北京 --cache-only         # 只用缓存，不联网
+    python 天气预报.py all --store              # 查询并追加到历史记录（见 weather_store）
+
+requests 在第一次真正发请求时才导入，--help 和只用缓存的查询不必等它加载。
+"""
+import time
+
+from weather_parse import parse_forecast
 
 # 常用城市名到城市编号的映射字典
 CITY_CODE_MAP = {
@@ -43,85 +58,326 @@ CITY_CODE_MAP = {
     "呼和浩特": "53463", # 呼和浩特
 }
 
-print("Welcome to use this weather forecast programme!")
-while True:
-    # 获取用户输入的城市名
-    city_name = input("Please enter the city name in Chinese: ")
-
-    # 检查城市是否在映射表中
-    if city_name not in CITY_CODE_MAP:
-        print(f"Sorry,we do not have the information of '{city_name}'.")
-        print(f"Cities whose information are available：")
-        for key, value in CITY_CODE_MAP.items():
-            print(f"{key}: {value}")
+# weather.cma.cn 城市页面的URL格式是 BASE_URL + 城市编号 + ".html"
+BASE_URL = "https://weather.cma.cn/web/weather/"
+# (连接超时, 读取超时)，单位秒
+TIMEOUT = (3.05, 10)
+# 连接池里保留的连接数：每个城市一个，刷新所有城市时所有请求同时发出
+WORKERS = len(CITY_CODE_MAP)
+
+
+def make_session(pool_size=WORKERS):
+    """创建复用连接的 Session，多个线程可以共用同一个连接池"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def forecast_url(city_code, base_url=BASE_URL):
+    return f"{base_url}{city_code}.html"
+
+
+def _result(city_code, url, source, start, ok=False, forecast=None, error=None, status=None, fetched=None):
+    return {"code": city_code, "url": url, "ok": ok, "status": status,
+            "elapsed": time.perf_counter() - start, "forecast": forecast,
+            "error": error, "source": source, "fetched": fetched}
+
+
+def cached_forecast(city_code, cache, stale=False, base_url=BASE_URL):
+    """只查缓存：有没过期的缓存（stale 为 True 时过期的也算）就返回结果，否则返回 None"""
+    start = time.perf_counter()
+    url = forecast_url(city_code, base_url)
+    entry, source = cache.entry(url) if stale else cache.lookup(url)
+    if entry is None:
+        return None
+    return _result(city_code, entry["url"], source, start, ok=True, forecast=entry["forecast"],
+                   fetched=entry["fetched"])
+
+
+def fetch_forecast(city_code, session=None, timeout=TIMEOUT, base_url=BASE_URL, cache=None, cache_only=False):
+    """下载并解析一个城市的页面
+
+    返回 {"code", "url", "ok", "status", "elapsed", "forecast", "error", "source", "fetched"}：
+    ok 为 False 时 forecast 为 None，error 说明原因（网络错误、状态码不是 200 或被重定向）。
+    cache 为 weather_cache.ForecastCache 时先查缓存，没过期就不发请求；
+    过期的缓存带 ETag / Last-Modified 重新验证，服务器回 304 时不再解析页面。
+    cache_only 为 True 时只用缓存（过期的也用），不发请求。
+    source 为 "memory"、"disk"、"revalidated"、"network"，没有结果时为 None；
+    fetched 为预报下载（或重新验证）时的 Unix 时间，从缓存取出时是当初下载的时间。
+    """
+    url = forecast_url(city_code, base_url)
+    start = time.perf_counter()
+    headers = None
+    if cache is not None:
+        result = cached_forecast(city_code, cache, cache_only, base_url)
+        if result is not None:
+            return result
+        headers = cache.validators(url)
+    if cache_only:
+        return _result(city_code, url, None, start, error="not in cache")
+
+    import requests
+
+    try:
+        response = (session or requests).get(url, timeout=timeout, headers=headers)
+    except requests.RequestException as e:
+        return _result(city_code, url, "network", start, error=f"{type(e).__name__}: {e}")
+    status = response.status_code
+    entry = cache.revalidated(url) if status == 304 and cache is not None else None
+    if entry is not None:
+        return _result(city_code, url, "revalidated", start, ok=True, forecast=entry["forecast"],
+                       status=status, fetched=entry["fetched"])
+    if status == 200 and response.url == url:
+        forecast = parse_forecast(response.content)
+        fetched = time.time()
+        if cache is not None:
+            fetched = cache.store(city_code, url, forecast, response.headers.get("ETag"),
+                                  response.headers.get("Last-Modified"))["fetched"]
+        return _result(city_code, url, "network", start, ok=True, forecast=forecast,
+                       status=status, fetched=fetched)
+    error = f"redirected to {response.url}" if status == 200 else f"HTTP {status}"
+    return _result(city_code, url, "network", start, error=error, status=status)
+
+
+def fetch_all(cities=None, session=None, workers=None, timeout=TIMEOUT, base_url=BASE_URL,
+              cache=None, cache_only=False):
+    """并发下载 cities（城市名列表，默认 CITY_CODE_MAP 里的全部城市）
+
+    缓存里有的先在当前线程直接取出，其余的交给线程池；
+    所有线程共用一个 Session 的连接池，总用时接近最慢的那一个请求，
+    而不是所有请求相加。workers 是同时下载的城市数的上限，默认每个要下载的城市一个线程。
+    cache、cache_only 同 fetch_forecast()。
+    返回 {城市名: fetch_forecast() 的结果}，顺序与 cities 相同。
+    """
+    cities = list(CITY_CODE_MAP) if cities is None else list(cities)
+    results = {}
+    if cache is not None:
+        for city in cities:
+            result = cached_forecast(CITY_CODE_MAP[city], cache, cache_only, base_url)
+            if result is not None:
+                results[city] = result
+    todo = [city for city in cities if city not in results]
+    if todo and cache_only:
+        for city in todo:
+            results[city] = fetch_forecast(CITY_CODE_MAP[city], base_url=base_url, cache_only=True)
+    elif todo:
+        from concurrent.futures import ThreadPoolExecutor
+
+        # 至少一个线程，不超过要下载的城市数
+        workers = len(todo) if workers is None else max(1, min(workers, len(todo)))
+        own_session = session is None
+        if own_session:
+            session = make_session(workers)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                fetched = pool.map(
+                    lambda city: fetch_forecast(CITY_CODE_MAP[city], session, timeout, base_url, cache), todo)
+                results.update(zip(todo, fetched))
+        finally:
+            if own_session:
+                session.close()
+    return {city: results[city] for city in cities}
+
+
+def format_forecast(result):
+    """按交互版的格式把 fetch_forecast() 的结果排成多行文字"""
+    if not result["ok"]:
+        lines = ["您的查询失败。"]
+        if result["status"] is not None:
+            lines.append(f"状态码: {result['status']}")
+        lines.append(f"原因: {result['error']}")
+        return "\n".join(lines)
+    lines = ["Your query is working.", f"URL of targeted city: {result['url']}"]
+
+    today = result["forecast"]["today"]
+    if today:
+        lines.append("\nToday's weather Information:")
+        lines.append(f"Date: {today.date}" if today.date else "Date missing.")
+        lines.append(f"Highest temperature: {today.high}" if today.high
+                     else "Highest temperature is not available.")
+        lines.append(f"Lowest temperature:: {today.low}" if today.low
+                     else "Lowest temperature is not available.")
+    else:
+        lines.append("Information of today's weather is not available.")
+
+    lines.append("\nFuture weather information:")
+    future = result["forecast"]["future"]
+    if future:
+        for day in future:
+            lines.append(f"Date: {day.date or 'Date missing.'}  "
+                         f"Highest Temperature: {day.high or '未知'}  Lowest Temperature: {day.low or '未知'}")
     else:
-        # 获取城市编号
-        city_code = CITY_CODE_MAP[city_name]
-
-        # 构造目标URL - weather.cma.cn 城市页面的URL格式通常是这样的
-        # 注意：实际URL格式可能需要根据网站结构调整
-        url = f"https://weather.cma.cn/web/weather/{city_code}.html"
-
-        print(f"Searching for {city_name}'s weather information...")
-
-        response = requests.get(url)
-
-        if response.status_code == 200 and response.url == url :
-            print("Your query is working.")
-            print(f"URL of targeted city: {response.url}")
-
-            soup = BeautifulSoup(response.content, "lxml")
-
-            # 尝试查找今天的天气
-            weather_today = soup.find("div", {"class": "pull-left day actived"})
-            if weather_today:
-                print("\nToday's weather Information:")
-                try:
-                    date_match = re.findall(r"[0-9]{2}/[0-9]{2}", weather_today.text)
-                    if date_match:
-                        print("Date:", date_match[0])
-                    else:
-                        print("Date missing.")
-                except:
-                    print("Date:Fail to analyze.")
-
-                high_temp = weather_today.find('div', {'class': 'high'})
-                if high_temp:
-                    print("Highest temperature:", re.sub(r'\s+', '', high_temp.text))
-                else:
-                    print("Highest temperature is not available.")
-
-                low_temp = weather_today.find('div', {'class': 'low'})
-                if low_temp:
-                    print("Lowest temperature::", re.sub(r'\s+', '', low_temp.text))
-                else:
-                    print("Lowest temperature is not available.")
-            else:
-                print("Information of today's weather is not available.")
-
-            # 尝试查找未来天气
-            print("\nFuture weather information:")
-            weather_future = soup.find_all("div", {"class": "pull-left day"})
-
-            if weather_future:
-                for item in weather_future:
-                    try:
-                        date_match = re.findall(r"[0-9]{2}/[0-9]{2}", item.text)
-                        date = date_match[0] if date_match else "Date missing."
-                    except:
-                        date = "Date missing."
-
-                    high_temp = item.find('div', {'class': 'high'})
-                    high = re.sub(r'\s+', '', high_temp.text) if high_temp else "未知"
-
-                    low_temp = item.find('div', {'class': 'low'})
-                    low = re.sub(r'\s+', '', low_temp.text) if low_temp else "未知"
-
-                    print(f"Date: {date}  Highest Temperature: {high}  Lowest Temperature: {low}")
-            else:
-                print("Information of future weather is not available.")
+        lines.append("Information of future weather is not available.")
+    return "\n".join(lines)
+
+
+def print_forecast(result):
+    print(format_forecast(result))
+
+
+def format_text(results):
+    """{城市名: 结果} 中每个城市的完整预报"""
+    return "\n\n".join(f"== {city} ({result['code']}) ==\n{format_forecast(result)}"
+                       for city, result in results.items())
+
+
+def format_summary(results):
+    """每个城市一行：今天的最高、最低温度，结果的来源和用时"""
+    lines = []
+    for city, result in results.items():
+        if result["ok"] and result["forecast"]["today"]:
+            today = result["forecast"]["today"]
+            lines.append(f"{city}\t{today.date or '-'}  {today.high or '未知'} / {today.low or '未知'}"
+                         f"  ({result['source']}, {result['elapsed'] * 1000:.0f} ms)")
+        elif result["ok"]:
+            lines.append(f"{city}\tInformation of today's weather is not available.")
+        else:
+            lines.append(f"{city}\t查询失败: {result['error']}")
+    return "\n".join(lines)
+
+
+def _days(result):
+    """(类别, DayForecast) 列表，类别为 "today" 或 "future" """
+    if not result["ok"]:
+        return []
+    forecast = result["forecast"]
+    days = [("today", forecast["today"])] if forecast["today"] else []
+    return days + [("future", day) for day in forecast["future"]]
+
+
+def format_json(results):
+    import json
+
+    def day_json(day):
+        return {"date": day.date, "high": day.high, "low": day.low, "high_c": day.high_c, "low_c": day.low_c}
+
+    return json.dumps([{"city": city, "code": result["code"], "ok": result["ok"], "source": result["source"],
+                        "error": result["error"],
+                        "today": day_json(result["forecast"]["today"])
+                        if result["ok"] and result["forecast"]["today"] else None,
+                        "future": [day_json(day) for kind, day in _days(result) if kind == "future"]}
+                       for city, result in results.items()], ensure_ascii=False, indent=2)
+
+
+def format_csv(results):
+    """每天一行：city,code,kind,date,high,low，温度为摄氏度数字；查询失败的城市没有行"""
+    import csv
+    import io
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(("city", "code", "kind", "date", "high", "low"))
+    for city, result in results.items():
+        for kind, day in _days(result):
+            writer.writerow((city, result["code"], kind, day.date, day.high_c, day.low_c))
+    return out.getvalue().rstrip("\n")
+
+
+FORMATS = {"text": format_text, "summary": format_summary, "json": format_json, "csv": format_csv}
+
+
+def interactive(session=None, cache=None, timeout=TIMEOUT, base_url=BASE_URL):
+    """原来的一问一答查询"""
+    print("Welcome to use this weather forecast programme!")
+    while True:
+        # 获取用户输入的城市名，输入 "全部" 时同时查询所有城市
+        city_name = input("Please enter the city name in Chinese (or 全部 for all cities): ")
+
+        if city_name == "全部":
+            start = time.perf_counter()
+            results = fetch_all(session=session, timeout=timeout, base_url=base_url, cache=cache)
+            print(format_summary(results))
+            print(f"Fetched {len(results)} cities in {time.perf_counter() - start:.2f} s.")
+        # 检查城市是否在映射表中
+        elif city_name not in CITY_CODE_MAP:
+            print(f"Sorry,we do not have the information of '{city_name}'.")
+            print(f"Cities whose information are available：")
+            for key, value in CITY_CODE_MAP.items():
+                print(f"{key}: {value}")
+        else:
+            print(f"Searching for {city_name}'s weather information...")
+            print_forecast(fetch_forecast(CITY_CODE_MAP[city_name], session, timeout, base_url, cache))
+        if input("Do you want to restart your query process? (y/n):") == 'n':
+            break
+
+
+def resolve_cities(names):
+    """城市名或编号 -> 城市名列表；"all" / "全部" 表示所有城市，不认识的名称抛出 ValueError"""
+    codes = {code: city for city, code in CITY_CODE_MAP.items()}
+    cities = []
+    for name in names:
+        if name in ("all", "全部"):
+            cities.extend(CITY_CODE_MAP)
+        elif name in CITY_CODE_MAP:
+            cities.append(name)
+        elif name in codes:
+            cities.append(codes[name])
         else:
-            print("您的查询失败。")
-            print("状态码:", response.status_code)
-    if input("Do you want to restart your query process? (y/n):") == 'n':
-        break
\ No newline at end of file
+            raise ValueError(f"unknown city {name!r}")
+    return list(dict.fromkeys(cities))
+
+
+def main(argv=None):
+    import argparse
+
+    from weather_cache import DEFAULT_PATH, DEFAULT_TTL, ForecastCache
+
+    parser = argparse.ArgumentParser(description="Weather forecasts from weather.cma.cn. "
+                                                 "Without cities, starts the interactive query.")
+    parser.add_argument("cities", nargs="*", help="city names or station codes, or 'all'")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="output format (default: text for one city, summary for several)")
+    parser.add_argument("--cache-only", action="store_true", help="answer from the cache only, even if stale")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the cache")
+    parser.add_argument("--cache-dir", default=DEFAULT_PATH)
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL, help="seconds before a cached forecast expires")
+    parser.add_argument("--timeout", type=float, help="per-request timeout in seconds")
+    parser.add_argument("--workers", type=int,
+                        help="cap on concurrent requests (default: one per city being fetched)")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--store", action="store_true", help="append the forecasts to a SQLite history")
+    parser.add_argument("--store-path", metavar="PATH",
+                        help="history file for --store, implies --store (default: ~/.cache/weather/history.sqlite3)")
+    parser.add_argument("--list", action="store_true", help="list the available cities and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for city, code in CITY_CODE_MAP.items():
+            print(f"{city}: {code}")
+        return 0
+    if args.no_cache and args.cache_only:
+        parser.error("--cache-only needs the cache")
+    if args.workers is not None and args.workers < 1:
+        parser.error(f"--workers must be at least 1, got {args.workers}")
+    try:
+        cities = resolve_cities(args.cities)
+    except ValueError as e:
+        parser.error(f"{e}; use --list to see the available cities")
+    cache = None if args.no_cache else ForecastCache(args.cache_dir, args.ttl)
+    timeout = TIMEOUT if args.timeout is None else args.timeout
+
+    if not cities:
+        # 整个会话共用一个 Session，重复查询时不必重新建立 TCP/TLS 连接；
+        # 查过的城市在缓存有效期内直接从缓存回答
+        interactive(make_session(args.workers or WORKERS), cache, timeout, args.base_url)
+        return 0
+
+    results = fetch_all(cities, workers=args.workers, timeout=timeout, base_url=args.base_url,
+                        cache=cache, cache_only=args.cache_only)
+    if args.store or args.store_path:
+        from weather_store import DEFAULT_PATH as STORE_PATH, ForecastStore
+
+        with ForecastStore(args.store_path or STORE_PATH) as store:
+            store.record(results)
+    fmt = args.format or ("text" if len(cities) == 1 else "summary")
+    print(FORMATS[fmt](results))
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())